@@ -1,23 +1,34 @@
 import logging
-import os
 import shutil
+import tempfile
+import time
 
 import pytest
-from ocp_resources.node import Node
-from ocp_resources.pod import Pod
-from ocp_utilities.infra import get_client
-from ocp_wrapper_data_collector.data_collector import (
-    collect_pods_data,
-    collect_resources_yaml_instance,
-    prepare_pytest_item_data_dir,
-)
 from pyaml_env import parse_config
 from pytest_testconfig import config as py_config
 
-from utilities.logger import setup_logging
+from utilities.instrumentation import SessionMetrics
+from utilities.logger import (
+    LOG_SEGMENT_ATTRIBUTE,
+    RateLimitFilter,
+    remove_log_files,
+    reset_rate_limit,
+    setup_logging,
+    stop_logging,
+)
+from utilities.session_snapshot import (
+    SESSION_SNAPSHOT_DIRECTORY_INPUT,
+    get_worker_file_path,
+    get_xdist_worker_id,
+)
+
+# Heavy dependencies (ocp_resources, kubernetes, OCM and ROSA clients) are imported in the hooks and fixtures which use
+# them; scripts/code_check/import_time.py checks conftest and test modules import time.
 
 LOGGER = logging.getLogger(__name__)
 BASIC_LOGGER = logging.getLogger("basic")
+# Session fixtures which cannot be shared between xdist workers; tests using them run on a single worker
+XDIST_GROUP_FIXTURES = ("multi_clusters_sanity_results",)
 
 
 def separator(symbol_, val=None):
@@ -35,6 +46,8 @@ def pytest_addoption(parser):
     ocm_group = parser.getgroup(name="OCM")
     upgrade_group = parser.getgroup(name="Upgrade")
     cluster_group = parser.getgroup(name="Cluster")
+    metrics_group = parser.getgroup(name="Metrics")
+    api_group = parser.getgroup(name="API")
 
     # Data collector group
     data_collector_group.addoption(
@@ -46,6 +59,38 @@ def pytest_addoption(parser):
         help="Path to pytest log file",
         default="pytest-tests.log",
     )
+    data_collector_group.addoption(
+        "--pytest-log-format",
+        choices=["text", "json"],
+        default="text",
+        help="pytest log file format; json writes one JSON object per log record, with test nodeid and phase",
+    )
+    data_collector_group.addoption(
+        "--log-rate-limit",
+        type=float,
+        default=0.2,
+        help="Log records per second allowed per call site once its burst is used; WARNING and above are never limited",
+    )
+    data_collector_group.addoption(
+        "--log-rate-limit-burst",
+        type=int,
+        default=10,
+        help="Log records allowed per call site before --log-rate-limit applies",
+    )
+    data_collector_group.addoption(
+        "--log-rate-limit-scope",
+        choices=["phase", "session", "off"],
+        default="phase",
+        help=(
+            "Log rate limit scope; phase resets the limit at each test phase (setup, call, teardown), session never"
+            " resets it, off disables rate limiting"
+        ),
+    )
+    data_collector_group.addoption(
+        "--log-rate-limit-loggers",
+        default="",
+        help="Comma-separated logger names to rate-limit (including their child loggers), default: all loggers",
+    )
 
     # OCM group
     ocm_group.addoption("--cluster-name", help="Cluster name")
@@ -53,6 +98,16 @@ def pytest_addoption(parser):
     # Upgrade group
     upgrade_group.addoption("--ocp-target-version", help="cluster OCP target version")
 
+    # API group
+    api_group.addoption(
+        "--record-api",
+        help="Path to API cassette directory; record Kubernetes and OCM API requests and responses",
+    )
+    api_group.addoption(
+        "--replay-api",
+        help="Path to API cassette directory; replay recorded Kubernetes and OCM API responses, without network",
+    )
+
     # Cluster group
     cluster_group.addoption(
         "--kubeconfig-file-paths",
@@ -61,6 +116,60 @@ def pytest_addoption(parser):
         str of comma-separated kubeconfig file paths, pass '--kubeconfig-file-path=<path to file>,<path to file>'
         """,
     )
+    cluster_group.addoption(
+        "--cluster-sanity-max-workers",
+        type=int,
+        default=10,
+        help="Maximum number of clusters to run cluster sanity against concurrently",
+    )
+    cluster_group.addoption(
+        "--cluster-sanity-timeout",
+        type=int,
+        default=600,
+        help="Cluster sanity timeout in seconds, per cluster",
+    )
+
+    # Metrics group
+    metrics_group.addoption(
+        "--session-metrics-report",
+        help=(
+            "Path to JSON report file; enables recording wall time per test phase and fixture, and Kubernetes and"
+            " OCM API requests"
+        ),
+    )
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_cmdline_main(config):
+    # With xdist (-n), keep xdist_group tests on a single worker unless another --dist mode was requested
+    if getattr(config.option, "numprocesses", None) and config.option.dist == "no":
+        config.option.dist = "loadgroup"
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    # xdist controller: workers share session snapshots through a directory created once per run
+    if not py_config.get("session_snapshot_directory"):
+        py_config["session_snapshot_directory"] = tempfile.mkdtemp(prefix="pytest-session-snapshots-")
+
+    node.workerinput[SESSION_SNAPSHOT_DIRECTORY_INPUT] = py_config["session_snapshot_directory"]
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):
+    if not get_xdist_worker_id(config=config):
+        return
+
+    for item in items:
+        if item.get_closest_marker(name="dependency"):
+            # Dependency-chained tests run in order, on the same worker
+            item.add_marker(pytest.mark.xdist_group(name=item.parent.nodeid))
+            continue
+
+        for fixture_name in XDIST_GROUP_FIXTURES:
+            if fixture_name in item.fixturenames:
+                item.add_marker(pytest.mark.xdist_group(name=fixture_name))
+                break
 
 
 def pytest_generate_tests(metafunc):
@@ -72,23 +181,49 @@ def pytest_generate_tests(metafunc):
 
 
 def pytest_sessionstart(session):
+    # xdist workers share the data collector directory, which is cleaned by the controller
+    xdist_worker_id = get_xdist_worker_id(config=session.config)
     data_collector = session.config.getoption("--data-collector")
     if data_collector:
+        from utilities.data_collector import ARCHIVE_FILE_NAME
+
         py_config["data_collector"] = parse_config(path=data_collector)
-        shutil.rmtree(
-            py_config["data_collector"]["data_collector_base_directory"],
-            ignore_errors=True,
-        )
+        if xdist_worker_id:
+            py_config["data_collector"]["archive_file_name"] = get_worker_file_path(
+                config=session.config, file_path=ARCHIVE_FILE_NAME
+            )
+        else:
+            shutil.rmtree(
+                py_config["data_collector"]["data_collector_base_directory"],
+                ignore_errors=True,
+            )
 
-    tests_log_file = session.config.getoption("pytest_log_file")
-    if os.path.exists(tests_log_file):
-        shutil.rmtree(tests_log_file, ignore_errors=True)
+    tests_log_file = get_worker_file_path(config=session.config, file_path=session.config.getoption("pytest_log_file"))
+    remove_log_files(log_file=tests_log_file)
 
     setup_logging(
         log_file=tests_log_file,
         log_level=session.config.getoption("log_cli_level") or logging.INFO,
+        log_format=session.config.getoption("--pytest-log-format"),
+        rate_limit_filter=get_rate_limit_filter(config=session.config),
     )
 
+    if session.config.getoption("--session-metrics-report"):
+        SessionMetrics().start()
+
+    record_api = session.config.getoption("--record-api")
+    replay_api = session.config.getoption("--replay-api")
+    if record_api and replay_api:
+        raise pytest.UsageError("--record-api and --replay-api are mutually exclusive")
+
+    if record_api or replay_api:
+        from utilities.api_cassette import RECORD_MODE, REPLAY_MODE, ApiCassette
+
+        ApiCassette(
+            cassette_directory=get_worker_file_path(config=session.config, file_path=record_api or replay_api),
+            mode=RECORD_MODE if record_api else REPLAY_MODE,
+        ).start()
+
 
 def pytest_report_teststatus(report, config):
     test_name = report.head_line
@@ -114,22 +249,43 @@ def pytest_runtest_setup(item):
     """
     Use incremental
     """
-    BASIC_LOGGER.info(f"\n{separator(symbol_='-', val=item.name)}")
+    BASIC_LOGGER.info(
+        f"\n{separator(symbol_='-', val=item.name)}",
+        extra={LOG_SEGMENT_ATTRIBUTE: {"nodeid": item.nodeid, "phase": "SETUP"}},
+    )
     set_up_pytest_runtest_phase(item=item, phase="SETUP")
 
 
 def pytest_sessionfinish(session, exitstatus):
     reporter = session.config.pluginmanager.get_plugin("terminalreporter")
-    reporter.summary_stats()
+    if reporter:
+        reporter.summary_stats()
 
-    # Remove empty directories from data collector directory
     if session.config.getoption("--data-collector"):
-        collector_directory = py_config["data_collector"]["data_collector_base_directory"]
-        for root, dirs, files in os.walk(collector_directory, topdown=False):
-            for _dir in dirs:
-                dir_path = os.path.join(root, _dir)
-                if not os.listdir(dir_path):
-                    shutil.rmtree(dir_path, ignore_errors=True)
+        content_store = py_config["data_collector"].get("content_store")
+        if content_store:
+            content_store.close()
+
+    session_metrics = SessionMetrics.active
+    if session_metrics:
+        session_metrics.write_report(
+            report_file=get_worker_file_path(
+                config=session.config, file_path=session.config.getoption("--session-metrics-report")
+            )
+        )
+        session_metrics.stop()
+
+    if session.config.getoption("--record-api") or session.config.getoption("--replay-api"):
+        from utilities.api_cassette import ApiCassette
+
+        if ApiCassette.active:
+            ApiCassette.active.stop()
+
+    session_snapshot_directory = py_config.get("session_snapshot_directory")
+    if session_snapshot_directory:
+        shutil.rmtree(session_snapshot_directory, ignore_errors=True)
+
+    stop_logging()
 
 
 def pytest_runtest_call(item):
@@ -140,30 +296,92 @@ def pytest_runtest_teardown(item):
     set_up_pytest_runtest_phase(item=item, phase="TEARDOWN")
 
 
+@pytest.hookimpl(hookwrapper=True)
+def pytest_fixture_setup(fixturedef, request):
+    session_metrics = SessionMetrics.active
+    if not session_metrics:
+        yield
+        return
+
+    with session_metrics.time_fixture(name=fixturedef.argname, scope=fixturedef.scope):
+        yield
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    session_metrics = SessionMetrics.active
+    if session_metrics:
+        session_metrics.add_phase_duration(nodeid=item.nodeid, phase=call.when, seconds=call.duration)
+        if call.when == "teardown":
+            # Added before the teardown report is created, reported as the test JUnit properties
+            item.user_properties.extend(session_metrics.get_test_properties(nodeid=item.nodeid))
+
+    yield
+
+
 @pytest.fixture(scope="session")
 def junitxml_plugin(request, record_testsuite_property):
     return record_testsuite_property if request.config.pluginmanager.has_plugin("junitxml") else None
 
 
+@pytest.fixture(scope="session", autouse=True)
+def session_metrics_junit_properties(junitxml_plugin):
+    yield
+    session_metrics = SessionMetrics.active
+    if session_metrics and junitxml_plugin:
+        for name, value in session_metrics.get_session_properties():
+            junitxml_plugin(name=name, value=value)
+
+
 def pytest_exception_interact(node, call, report):
     BASIC_LOGGER.error(report.longreprtext)
     if node.session.config.getoption("--data-collector") and not node.get_closest_marker(name="skip_data_collector"):
-        resources_to_collect = [Node]
-        base_directory = py_config["data_collector"]["data_collector_base_directory"]
+        # Tests can limit collected data, e.g. @pytest.mark.data_collector_scope(namespaces=["<namespace>"])
+        data_collector_scope = node.get_closest_marker(name="data_collector_scope")
         try:
-            collect_resources_yaml_instance(resources_to_collect=resources_to_collect, base_directory=base_directory)
-            pods = list(Pod.get(dyn_client=get_client()))
-            collect_pods_data(pods_list=pods, base_directory=base_directory)
+            from utilities.data_collector import collect_cluster_data
+
+            collect_cluster_data(
+                collector_directory=py_config["data_collector"]["collector_directory"],
+                data_collector_dict=py_config["data_collector"],
+                **(data_collector_scope.kwargs if data_collector_scope else {}),
+            )
 
         except Exception as exp:
             LOGGER.warning(f"Failed to collect resources: {exp}")
             return
 
 
+def get_rate_limit_filter(config):
+    if config.getoption("--log-rate-limit-scope") == "off":
+        return None
+
+    return RateLimitFilter(
+        rate=config.getoption("--log-rate-limit"),
+        burst=config.getoption("--log-rate-limit-burst"),
+        loggers=[name for name in config.getoption("--log-rate-limit-loggers").split(",") if name],
+    )
+
+
 def set_up_pytest_runtest_phase(item, phase):
-    BASIC_LOGGER.info(f"{separator(symbol_='-', val=phase)}")
+    if item.session.config.getoption("--log-rate-limit-scope") == "phase":
+        reset_rate_limit()
+
+    BASIC_LOGGER.info(
+        f"{separator(symbol_='-', val=phase)}",
+        extra={LOG_SEGMENT_ATTRIBUTE: {"nodeid": item.nodeid, "phase": phase}},
+    )
+    if SessionMetrics.active:
+        SessionMetrics.active.set_phase(nodeid=item.nodeid, phase=phase)
+
     if item.session.config.getoption("--data-collector") and not item.get_closest_marker(name="skip_data_collector"):
-        py_config["data_collector"]["collector_directory"] = prepare_pytest_item_data_dir(
+        from utilities.data_collector import get_pytest_item_data_dir
+
+        if phase == "SETUP":
+            # Pod logs collected upon failure start from the test setup
+            py_config["data_collector"]["test_start_time"] = time.time()
+
+        py_config["data_collector"]["collector_directory"] = get_pytest_item_data_dir(
             item=item,
             base_directory=py_config["data_collector"]["data_collector_base_directory"],
             subdirectory_name=phase.lower(),
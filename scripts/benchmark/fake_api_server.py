@@ -0,0 +1,481 @@
+"""
+Local stand-in for the Kubernetes, OCM and SSO APIs, serving a synthetic cluster.
+
+Supports what the suite uses: API discovery, get and paginated list (limit/continue, fieldSelector, labelSelector),
+watch (bookmark events only, until the watch timeout), pod logs, OCM versions and the SSO token exchange.
+
+Usage:
+    python scripts/benchmark/fake_api_server.py --port 8443 --nodes 100 --pods 20000 --managed-clusters 3000
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+OPENSHIFT_VERSION = "4.14.0"
+CLUSTER_OPERATORS_NUMBER = 30
+MAX_WATCH_SECONDS = 60
+WATCH_BOOKMARK_INTERVAL = 1
+SSO_TOKEN_PATH = "/auth/realms/redhat-external/protocol/openid-connect/token"
+# (group, version, kind, plural, namespaced)
+RESOURCES = (
+    ("", "v1", "Namespace", "namespaces", False),
+    ("", "v1", "Node", "nodes", False),
+    ("", "v1", "Pod", "pods", True),
+    ("config.openshift.io", "v1", "ClusterVersion", "clusterversions", False),
+    ("config.openshift.io", "v1", "ClusterOperator", "clusteroperators", False),
+    ("cluster.open-cluster-management.io", "v1", "ManagedCluster", "managedclusters", False),
+)
+RESOURCE_PATH_REGEX = re.compile(
+    r"^/(?:api/(?P<core_version>v1)|apis/(?P<group>[^/]+)/(?P<version>[^/]+))"
+    r"(?:/watch)?(?:/namespaces/(?P<namespace>[^/]+))?/(?P<plural>[^/]+)(?:/(?P<name>[^/]+))?(?:/(?P<sub>log))?$"
+)
+
+
+def get_api_version(group, version):
+    return f"{group}/{version}" if group else version
+
+
+def get_object(group, version, kind, name, namespace=None, labels=None, spec=None, status=None, resource_version=1):
+    metadata = {
+        "name": name,
+        "uid": f"{kind.lower()}-{namespace or ''}-{name}",
+        "resourceVersion": str(resource_version),
+        "creationTimestamp": "2024-01-01T00:00:00Z",
+        "labels": labels or {},
+    }
+    if namespace:
+        metadata["namespace"] = namespace
+
+    return {
+        "apiVersion": get_api_version(group=group, version=version),
+        "kind": kind,
+        "metadata": metadata,
+        "spec": spec or {},
+        "status": status or {},
+    }
+
+
+def get_conditions(conditions):
+    return [
+        {"type": _type, "status": status, "lastTransitionTime": "2024-01-01T00:00:00Z", "reason": _type}
+        for _type, status in conditions.items()
+    ]
+
+
+class SyntheticCluster:
+    """
+    Synthetic OpenShift cluster, also acting as an ACM hub with managed clusters.
+
+    Args:
+        nodes (int): number of nodes
+        pods (int): number of pods
+        managed_clusters (int): number of ACM managed clusters, including local-cluster
+        namespaces (int): number of namespaces pods are spread across
+        failed_pods (int): number of pods in Failed phase, which fail cluster sanity
+        log_lines (int): number of lines in each container log
+    """
+
+    def __init__(self, nodes, pods, managed_clusters, namespaces=100, failed_pods=0, log_lines=100):
+        self.log_lines = log_lines
+        self.objects = {}
+        self.objects["namespaces"] = [
+            get_object(group="", version="v1", kind="Namespace", name=f"namespace-{index}")
+            for index in range(namespaces)
+        ]
+        self.objects["nodes"] = [
+            get_object(
+                group="",
+                version="v1",
+                kind="Node",
+                name=f"node-{index}",
+                labels={f"node-role.kubernetes.io/{'master' if index < 3 else 'worker'}": ""},
+                status={
+                    "conditions": get_conditions(
+                        conditions={
+                            "MemoryPressure": "False",
+                            "DiskPressure": "False",
+                            "PIDPressure": "False",
+                            "Ready": "True",
+                        }
+                    )
+                },
+            )
+            for index in range(nodes)
+        ]
+        self.objects["pods"] = [
+            get_object(
+                group="",
+                version="v1",
+                kind="Pod",
+                name=f"pod-{index}",
+                namespace=f"namespace-{index % namespaces}",
+                labels={"app": f"app-{index % 50}"},
+                spec={"nodeName": f"node-{index % nodes}", "containers": [{"name": "main", "image": "image:latest"}]},
+                status={
+                    "phase": "Failed" if index < failed_pods else "Running",
+                    "containerStatuses": [{"name": "main", "ready": index >= failed_pods, "restartCount": 0}],
+                },
+            )
+            for index in range(pods)
+        ]
+        self.objects["clusterversions"] = [
+            get_object(
+                group="config.openshift.io",
+                version="v1",
+                kind="ClusterVersion",
+                name="version",
+                status={
+                    "desired": {"version": OPENSHIFT_VERSION},
+                    "history": [{"state": "Completed", "version": OPENSHIFT_VERSION}],
+                    "conditions": get_conditions(conditions={"Available": "True", "Progressing": "False"}),
+                },
+            )
+        ]
+        self.objects["clusteroperators"] = [
+            get_object(
+                group="config.openshift.io",
+                version="v1",
+                kind="ClusterOperator",
+                name=f"operator-{index}",
+                status={"conditions": get_conditions(conditions={"Available": "True", "Degraded": "False"})},
+            )
+            for index in range(CLUSTER_OPERATORS_NUMBER)
+        ]
+        self.objects["managedclusters"] = [
+            get_object(
+                group="cluster.open-cluster-management.io",
+                version="v1",
+                kind="ManagedCluster",
+                name="local-cluster" if index == 0 else f"managed-cluster-{index}",
+                labels={"cloud": "Amazon", "vendor": "OpenShift"},
+                spec={"hubAcceptsClient": True},
+                status={"conditions": get_conditions(conditions={"ManagedClusterConditionAvailable": "True"})},
+            )
+            for index in range(managed_clusters)
+        ]
+        # Objects are served as pre-encoded JSON
+        self.encoded_objects = {
+            plural: [json.dumps(_object).encode() for _object in objects] for plural, objects in self.objects.items()
+        }
+        self.index = {
+            plural: {
+                (_object["metadata"].get("namespace"), _object["metadata"]["name"]): position
+                for position, _object in enumerate(objects)
+            }
+            for plural, objects in self.objects.items()
+        }
+
+
+def match_selector(_object, selector, get_value):
+    for requirement in filter(None, (requirement.strip() for requirement in selector.split(","))):
+        if "!=" in requirement:
+            key, value = requirement.split("!=", 1)
+            if get_value(_object, key) == value:
+                return False
+        elif "=" in requirement:
+            key, value = requirement.split("==", 1) if "==" in requirement else requirement.split("=", 1)
+            if get_value(_object, key) != value:
+                return False
+        elif get_value(_object, requirement) is None:
+            return False
+
+    return True
+
+
+def get_field_value(_object, field):
+    value = _object
+    for key in field.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+
+    return value
+
+
+def get_label_value(_object, label):
+    return _object["metadata"]["labels"].get(label)
+
+
+class FakeApiRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.handle_request()
+
+    def handle_request(self):
+        parsed_url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parsed_url.query).items()}
+        self.server.request_counts[f"{self.command} {get_route(path=parsed_url.path)}"] += 1
+        try:
+            self.route(path=parsed_url.path.rstrip("/") or "/", query=query)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def route(self, path, query):
+        if path == SSO_TOKEN_PATH:
+            return self.send_json(body={"access_token": "fake-access-token", "expires_in": 900, "token_type": "Bearer"})
+
+        if path == "/version":
+            return self.send_json(body={"major": "1", "minor": "27", "gitVersion": "v1.27.0"})
+
+        if path == "/api":
+            return self.send_json(body={"kind": "APIVersions", "versions": ["v1"], "serverAddressByClientCIDRs": []})
+
+        if path == "/apis":
+            return self.send_json(body=get_api_group_list())
+
+        if path == "/api/v1" or path.count("/") == 3 and path.startswith("/apis/"):
+            return self.send_json(body=get_api_resource_list(group_version=path.split("/", 2)[2]))
+
+        if path == "/api/clusters_mgmt/v1/versions":
+            return self.send_json(
+                body={
+                    "kind": "VersionList",
+                    "page": 1,
+                    "size": 1,
+                    "total": 1,
+                    "items": [
+                        {
+                            "kind": "Version",
+                            "id": f"openshift-v{OPENSHIFT_VERSION}",
+                            "raw_id": OPENSHIFT_VERSION,
+                            "enabled": True,
+                        }
+                    ],
+                }
+            )
+
+        match = RESOURCE_PATH_REGEX.match(path)
+        if not match or match["plural"] not in self.server.cluster.objects:
+            return self.send_status(code=404, reason="NotFound", message=f"{path} not found")
+
+        if "/watch/" in path or query.get("watch", "").lower() in ("true", "1"):
+            return self.send_watch(plural=match["plural"], timeout=int(query.get("timeoutSeconds", MAX_WATCH_SECONDS)))
+
+        if match["name"]:
+            return self.send_object(
+                plural=match["plural"], namespace=match["namespace"], name=match["name"], log=bool(match["sub"])
+            )
+
+        return self.send_list(plural=match["plural"], namespace=match["namespace"], query=query)
+
+    def send_object(self, plural, namespace, name, log):
+        cluster = self.server.cluster
+        position = cluster.index[plural].get((namespace, name))
+        if position is None:
+            return self.send_status(code=404, reason="NotFound", message=f"{plural} {name} not found")
+
+        if log:
+            return self.send_body(
+                body="".join(f"{name} log line {line}\n" for line in range(cluster.log_lines)).encode(),
+                content_type="text/plain",
+            )
+
+        return self.send_body(body=cluster.encoded_objects[plural][position])
+
+    def send_list(self, plural, namespace, query):
+        cluster = self.server.cluster
+        positions = range(len(cluster.objects[plural]))
+        if namespace or query.get("fieldSelector") or query.get("labelSelector"):
+            positions = [
+                position
+                for position in positions
+                if (not namespace or cluster.objects[plural][position]["metadata"].get("namespace") == namespace)
+                and match_selector(
+                    _object=cluster.objects[plural][position],
+                    selector=query.get("fieldSelector", ""),
+                    get_value=get_field_value,
+                )
+                and match_selector(
+                    _object=cluster.objects[plural][position],
+                    selector=query.get("labelSelector", ""),
+                    get_value=get_label_value,
+                )
+            ]
+
+        start = int(query.get("continue") or 0)
+        limit = int(query.get("limit") or 0)
+        end = min(start + limit, len(positions)) if limit else len(positions)
+        metadata = {"resourceVersion": "1"}
+        if end < len(positions):
+            metadata["continue"] = str(end)
+
+        kind = cluster.objects[plural][0]["kind"] if cluster.objects[plural] else "List"
+        header = json.dumps({"apiVersion": "v1", "kind": f"{kind}List", "metadata": metadata})[:-1].encode()
+        items = b",".join(cluster.encoded_objects[plural][position] for position in positions[start:end])
+        return self.send_body(body=header + b', "items": [' + items + b"]}")
+
+    def send_watch(self, plural, timeout):
+        # No changes, like an idle cluster; bookmarks let clients notice they should stop watching
+        cluster = self.server.cluster
+        kind = cluster.objects[plural][0]["kind"] if cluster.objects[plural] else "List"
+        bookmark = json.dumps({
+            "type": "BOOKMARK",
+            "object": {"apiVersion": "v1", "kind": kind, "metadata": {"resourceVersion": "1"}},
+        }).encode()
+        chunk = b"%x\r\n%s\n\r\n" % (len(bookmark) + 1, bookmark)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        deadline = time.monotonic() + min(timeout, MAX_WATCH_SECONDS)
+        while not self.server.stop_event.wait(timeout=WATCH_BOOKMARK_INTERVAL) and time.monotonic() < deadline:
+            self.wfile.write(chunk)
+            self.wfile.flush()
+
+        self.wfile.write(b"0\r\n\r\n")
+
+    def send_status(self, code, reason, message):
+        return self.send_json(
+            body={
+                "kind": "Status",
+                "apiVersion": "v1",
+                "status": "Failure",
+                "reason": reason,
+                "message": message,
+                "code": code,
+            },
+            code=code,
+        )
+
+    def send_json(self, body, code=200):
+        return self.send_body(body=json.dumps(body).encode(), code=code)
+
+    def send_body(self, body, code=200, content_type="application/json"):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def get_route(path):
+    """
+    Args:
+        path (str): request path
+
+    Returns:
+        str: request path without namespace and object names, for request counts
+    """
+    match = RESOURCE_PATH_REGEX.match(path.rstrip("/"))
+    if not match:
+        return path
+
+    return "/".join(filter(None, [match["group"], match["plural"], "{name}" if match["name"] else "", match["sub"]]))
+
+
+def get_api_group_list():
+    groups = sorted({(group, version) for group, version, *_ in RESOURCES if group})
+    return {
+        "kind": "APIGroupList",
+        "apiVersion": "v1",
+        "groups": [
+            {
+                "name": group,
+                "versions": [{"groupVersion": f"{group}/{version}", "version": version}],
+                "preferredVersion": {"groupVersion": f"{group}/{version}", "version": version},
+            }
+            for group, version in groups
+        ],
+    }
+
+
+def get_api_resource_list(group_version):
+    resources = []
+    for group, version, kind, plural, namespaced in RESOURCES:
+        if get_api_version(group=group, version=version) != group_version:
+            continue
+
+        resources.append({
+            "name": plural,
+            "singularName": kind.lower(),
+            "namespaced": namespaced,
+            "kind": kind,
+            "verbs": ["get", "list", "watch"],
+        })
+        if plural == "pods":
+            resources.append({
+                "name": "pods/log",
+                "singularName": "",
+                "namespaced": True,
+                "kind": "Pod",
+                "verbs": ["get"],
+            })
+
+    return {"kind": "APIResourceList", "apiVersion": "v1", "groupVersion": group_version, "resources": resources}
+
+
+class FakeApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, cluster, port=0):
+        super().__init__(("127.0.0.1", port), FakeApiRequestHandler)
+        self.cluster = cluster
+        self.request_counts = Counter()
+        self.stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-api-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.shutdown()
+        self.server_close()
+
+
+def add_cluster_arguments(parser):
+    parser.add_argument("--nodes", type=int, default=100, help="Number of synthetic nodes")
+    parser.add_argument("--pods", type=int, default=20000, help="Number of synthetic pods")
+    parser.add_argument("--managed-clusters", type=int, default=3000, help="Number of synthetic ACM managed clusters")
+    parser.add_argument("--namespaces", type=int, default=100, help="Number of namespaces pods are spread across")
+    parser.add_argument("--failed-pods", type=int, default=10, help="Number of Failed pods; they fail cluster sanity")
+    parser.add_argument("--log-lines", type=int, default=100, help="Number of lines in each container log")
+
+
+def get_synthetic_cluster(args):
+    return SyntheticCluster(
+        nodes=args.nodes,
+        pods=args.pods,
+        managed_clusters=args.managed_clusters,
+        namespaces=args.namespaces,
+        failed_pods=args.failed_pods,
+        log_lines=args.log_lines,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic cluster through fake Kubernetes and OCM APIs")
+    parser.add_argument("--port", type=int, default=8443, help="Port to listen on (127.0.0.1)")
+    add_cluster_arguments(parser=parser)
+    args = parser.parse_args()
+
+    start_time = time.monotonic()
+    server = FakeApiServer(cluster=get_synthetic_cluster(args=args), port=args.port)
+    print(f"Synthetic cluster created in {time.monotonic() - start_time:.1f}s, serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop_event.set()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
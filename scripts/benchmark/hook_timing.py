@@ -0,0 +1,95 @@
+"""
+pytest plugin which times the session and test hooks, loaded by run_benchmark.py with `-p`.
+
+Each hook's wall time includes every implementation of the hook (root conftest and plugins).
+The report is written to the file in the BENCHMARK_HOOK_TIMING_FILE environment variable.
+"""
+
+import json
+import os
+import resource
+import time
+from collections import defaultdict
+
+import pytest
+
+
+HOOK_TIMING_FILE_ENV_VAR = "BENCHMARK_HOOK_TIMING_FILE"
+HOOK_TIMINGS = defaultdict(list)
+# ru_maxrss (KiB on Linux) when each hook last returned
+HOOK_PEAK_RSS = {}
+
+
+def get_peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def time_hook(name):
+    start_time = time.monotonic()
+    yield
+    HOOK_TIMINGS[name].append(time.monotonic() - start_time)
+    HOOK_PEAK_RSS[name] = get_peak_rss_mb()
+
+
+@pytest.hookimpl(hookwrapper=True, tryfirst=True)
+def pytest_sessionstart(session):
+    yield from time_hook(name="pytest_sessionstart")
+
+
+@pytest.hookimpl(hookwrapper=True, tryfirst=True)
+def pytest_collection(session):
+    yield from time_hook(name="pytest_collection")
+
+
+@pytest.hookimpl(hookwrapper=True, tryfirst=True)
+def pytest_runtest_setup(item):
+    yield from time_hook(name="pytest_runtest_setup")
+
+
+@pytest.hookimpl(hookwrapper=True, tryfirst=True)
+def pytest_runtest_call(item):
+    yield from time_hook(name="pytest_runtest_call")
+
+
+@pytest.hookimpl(hookwrapper=True, tryfirst=True)
+def pytest_runtest_teardown(item, nextitem):
+    yield from time_hook(name="pytest_runtest_teardown")
+
+
+@pytest.hookimpl(hookwrapper=True, tryfirst=True)
+def pytest_runtest_makereport(item, call):
+    yield from time_hook(name="pytest_runtest_makereport")
+
+
+@pytest.hookimpl(hookwrapper=True, tryfirst=True)
+def pytest_exception_interact(node, call, report):
+    yield from time_hook(name="pytest_exception_interact")
+
+
+@pytest.hookimpl(hookwrapper=True, tryfirst=True)
+def pytest_sessionfinish(session, exitstatus):
+    yield from time_hook(name="pytest_sessionfinish")
+
+
+def pytest_unconfigure(config):
+    hook_timing_file = os.environ.get(HOOK_TIMING_FILE_ENV_VAR)
+    if not hook_timing_file:
+        return
+
+    with open(hook_timing_file, "w") as fd:
+        json.dump(
+            {
+                "peak_rss_mb": get_peak_rss_mb(),
+                "hooks": {
+                    name: {
+                        "calls": len(timings),
+                        "seconds": sum(timings),
+                        "max_seconds": max(timings),
+                        "peak_rss_mb": HOOK_PEAK_RSS[name],
+                    }
+                    for name, timings in HOOK_TIMINGS.items()
+                },
+            },
+            fd,
+            indent=4,
+        )
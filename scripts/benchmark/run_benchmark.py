@@ -0,0 +1,203 @@
+"""
+Run the benchmark suite, which uses the real tests fixtures and root conftest hooks, against a synthetic cluster
+served by a local fake Kubernetes, OCM and SSO API server.
+
+Reports per-hook latency, peak RSS, slowest fixtures and API request counts, to catch scaling regressions in
+cluster sanity, failure data collection (pytest_exception_interact) and the ACM fixtures.
+
+Usage:
+    python -m scripts.benchmark.run_benchmark [--nodes 100] [--pods 20000] [--managed-clusters 3000]
+        [--failed-pods 10] [--collect-pod-logs] [--report benchmark-report.json] [-- <extra pytest args>]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from scripts.benchmark.fake_api_server import (
+    SSO_TOKEN_PATH,
+    FakeApiServer,
+    add_cluster_arguments,
+    get_synthetic_cluster,
+)
+from scripts.benchmark.hook_timing import HOOK_TIMING_FILE_ENV_VAR
+
+
+SUITE_DIRECTORY = os.path.join("scripts", "benchmark", "suite")
+DEFAULT_TOP_ENTRIES = 10
+
+
+def write_json(file_path, content):
+    with open(file_path, "w") as fd:
+        json.dump(content, fd, indent=4)
+
+    return file_path
+
+
+def read_json(file_path):
+    if not os.path.exists(file_path):
+        return {}
+
+    with open(file_path) as fd:
+        return json.load(fd)
+
+
+def write_kubeconfig(directory, server_url):
+    # JSON is valid YAML
+    return write_json(
+        file_path=os.path.join(directory, "kubeconfig"),
+        content={
+            "apiVersion": "v1",
+            "kind": "Config",
+            "clusters": [{"name": "benchmark", "cluster": {"server": server_url}}],
+            "users": [{"name": "benchmark", "user": {"token": "benchmark"}}],
+            "contexts": [{"name": "benchmark", "context": {"cluster": "benchmark", "user": "benchmark"}}],
+            "current-context": "benchmark",
+        },
+    )
+
+
+def write_data_collector_config(directory, collect_pod_logs):
+    return write_json(
+        file_path=os.path.join(directory, "data-collector.yaml"),
+        content={
+            "data_collector_base_directory": os.path.join(directory, "collected-info"),
+            "collect_data_function": "ocp_wrapper_data_collector.data_collector.collect_data",
+            "collect_pod_logs": collect_pod_logs,
+            "collect_pods_max_workers": 10,
+            "collect_pod_timeout": 60,
+            "collect_pods_total_timeout": 300,
+        },
+    )
+
+
+def run_suite(server_url, directory, args):
+    """
+    Run the benchmark suite in a pytest subprocess.
+
+    Args:
+        server_url (str): fake API server URL
+        directory (str): directory for the run configuration and reports
+        args (argparse.Namespace): benchmark arguments
+
+    Returns:
+        tuple: pytest exit code, wall time in seconds
+    """
+    env = dict(
+        os.environ,
+        KUBECONFIG=write_kubeconfig(directory=directory, server_url=server_url),
+        OCM_TOKEN="benchmark",
+        **{HOOK_TIMING_FILE_ENV_VAR: os.path.join(directory, "hook-timing.json")},
+    )
+    command = [
+        sys.executable,
+        "-m",
+        "pytest",
+        SUITE_DIRECTORY,
+        "-p",
+        "scripts.benchmark.hook_timing",
+        "-p",
+        "no:cacheprovider",
+        f"--basetemp={os.path.join(directory, 'pytest')}",
+        f"--junit-xml={os.path.join(directory, 'junit.xml')}",
+        f"--pytest-log-file={os.path.join(directory, 'pytest-tests.log')}",
+        f"--session-metrics-report={os.path.join(directory, 'session-metrics.json')}",
+        f"--data-collector={write_data_collector_config(directory=directory, collect_pod_logs=args.collect_pod_logs)}",
+        f"--tc=ocm_api_server:{server_url}",
+        f"--tc=ocm_sso_token_endpoint:{server_url}{SSO_TOKEN_PATH}",
+        *args.pytest_args,
+    ]
+    start_time = time.monotonic()
+    exit_code = subprocess.run(command, env=env).returncode
+    return exit_code, time.monotonic() - start_time
+
+
+def get_report(args, server, directory, exit_code, wall_seconds):
+    """
+    Args:
+        args (argparse.Namespace): benchmark arguments
+        server (FakeApiServer): fake API server, after the run
+        directory (str): directory with the run reports
+        exit_code (int): pytest exit code
+        wall_seconds (float): pytest wall time in seconds
+
+    Returns:
+        dict: benchmark report
+    """
+    hook_timing = read_json(file_path=os.path.join(directory, "hook-timing.json"))
+    session_metrics = read_json(file_path=os.path.join(directory, "session-metrics.json"))
+    return {
+        "synthetic_cluster": {
+            "nodes": args.nodes,
+            "pods": args.pods,
+            "managed_clusters": args.managed_clusters,
+            "namespaces": args.namespaces,
+            "failed_pods": args.failed_pods,
+            "collect_pod_logs": args.collect_pod_logs,
+        },
+        "pytest_exit_code": exit_code,
+        "wall_seconds": wall_seconds,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        "hooks": hook_timing.get("hooks", {}),
+        "fixtures": session_metrics.get("fixtures", []),
+        "api_calls": session_metrics.get("api_calls", []),
+        "server_requests": dict(sorted(server.request_counts.items(), key=lambda item: item[1], reverse=True)),
+    }
+
+
+def print_report(report, top):
+    print(f"\nSynthetic cluster: {report['synthetic_cluster']}")
+    print(f"pytest exit code {report['pytest_exit_code']}, wall time {report['wall_seconds']:.2f}s")
+    print(f"Peak RSS: {report['peak_rss_mb']:.0f}MB")
+    print("Hooks (calls, total, max, peak RSS after hook):")
+    for name, hook in sorted(report["hooks"].items(), key=lambda item: item[1]["seconds"], reverse=True):
+        print(
+            f"    {name:32} {hook['calls']:5} {hook['seconds']:8.3f}s {hook['max_seconds']:8.3f}s"
+            f" {hook['peak_rss_mb']:8.0f}MB"
+        )
+
+    print("Slowest fixtures:")
+    for fixture in report["fixtures"][:top]:
+        print(f"    {fixture['fixture']:40} {fixture['seconds']:8.3f}s")
+
+    print("API server requests:")
+    for route, count in list(report["server_requests"].items())[:top]:
+        print(f"    {count:8} {route}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tests fixtures and hooks against a synthetic cluster")
+    add_cluster_arguments(parser=parser)
+    parser.add_argument(
+        "--collect-pod-logs", action="store_true", help="Collect pods container logs when cluster sanity fails"
+    )
+    parser.add_argument("--report", default="benchmark-report.json", help="Benchmark report JSON file path")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_ENTRIES, help="Number of entries to print per section")
+    parser.add_argument("pytest_args", nargs="*", help="Extra pytest arguments, after --")
+    args = parser.parse_args()
+
+    server = FakeApiServer(cluster=get_synthetic_cluster(args=args))
+    server.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="benchmark-") as directory:
+            exit_code, wall_seconds = run_suite(server_url=server.url, directory=directory, args=args)
+            report = get_report(
+                args=args, server=server, directory=directory, exit_code=exit_code, wall_seconds=wall_seconds
+            )
+
+    finally:
+        server.stop()
+
+    write_json(file_path=args.report, content=report)
+    print_report(report=report, top=args.top)
+    print(f"Benchmark report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
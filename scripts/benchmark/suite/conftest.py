@@ -0,0 +1,9 @@
+# The real tests fixtures, run against the fake API server by run_benchmark.py
+from tests.acm_observability.conftest import acm_clusters, acm_managed_clusters  # noqa: F401
+from tests.conftest import (  # noqa: F401
+    admin_client_scope_session,
+    cluster_state_cache_scope_session,
+    nodes_scope_session,
+    ocm_client_scope_session,
+    ocm_token,
+)
@@ -0,0 +1,17 @@
+import pytest
+
+from utilities.infra import cluster_sanity
+
+
+class TestBenchmark:
+    def test_cluster_sanity(self, nodes_scope_session, admin_client_scope_session):
+        # Fails when the synthetic cluster has failed pods, which runs data collection in pytest_exception_interact
+        cluster_sanity(nodes=nodes_scope_session, admin_client=admin_client_scope_session, exit_pytest=False)
+
+    @pytest.mark.skip_data_collector
+    def test_acm_clusters(self, acm_clusters):
+        assert acm_clusters, "No ACM clusters found"
+
+    @pytest.mark.skip_data_collector
+    def test_ocm_client(self, ocm_client_scope_session):
+        assert ocm_client_scope_session.api_clusters_mgmt_v1_versions_get(), "Failed to get versions"
@@ -0,0 +1,97 @@
+"""
+Fail if importing the conftest and test modules, which pytest does on every run, takes longer than a budget.
+
+Usage:
+    python3 scripts/code_check/import_time.py [--budget-ms 3000] [--runs 3] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+
+DEFAULT_BUDGET_MS = 3000
+DEFAULT_RUNS = 3
+DEFAULT_TOP_MODULES = 15
+TESTS_DIRECTORY = "tests"
+
+
+def get_collected_modules():
+    """
+    Returns:
+        list: module names of conftest files and test modules
+    """
+    modules = ["conftest"]
+    for root, _, files in os.walk(TESTS_DIRECTORY):
+        if "__pycache__" in root:
+            continue
+
+        for filename in sorted(files):
+            if filename == "conftest.py" or (filename.startswith("test_") and filename.endswith(".py")):
+                modules.append(os.path.splitext(os.path.join(root, filename))[0].replace(os.sep, "."))
+
+    return modules
+
+
+def measure_import_time(modules):
+    """
+    Import modules in a fresh interpreter with `-X importtime`.
+
+    Args:
+        modules (list): module names
+
+    Returns:
+        tuple: total import time in microseconds, dict of top-level imported module name to cumulative microseconds
+    """
+    res = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "\n".join(f"import {module}" for module in modules),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if res.returncode != 0:
+        errors = [line for line in res.stderr.splitlines() if not line.startswith("import time:")]
+        sys.exit("Failed to import modules:\n" + "\n".join(errors))
+
+    top_level_modules = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        # Nested imports are indented by two spaces per level
+        if not name.startswith("  "):
+            top_level_modules[name.strip()] = int(cumulative)
+
+    return sum(top_level_modules.values()), top_level_modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check conftest and test modules import time")
+    parser.add_argument("--budget-ms", type=int, default=DEFAULT_BUDGET_MS, help="Import time budget in milliseconds")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Number of runs; the fastest run is used")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_MODULES, help="Number of slowest imports to print")
+    args = parser.parse_args()
+
+    modules = get_collected_modules()
+    total, top_level_modules = min(
+        (measure_import_time(modules=modules) for _ in range(args.runs)), key=lambda measurement: measurement[0]
+    )
+    print(f"Importing {len(modules)} conftest and test modules took {total / 1000:.0f}ms (budget {args.budget_ms}ms)")
+    print("Slowest imports:")
+    for name, cumulative in sorted(top_level_modules.items(), key=lambda item: item[1], reverse=True)[: args.top]:
+        print(f"    {cumulative / 1000:8.1f}ms {name}")
+
+    if total / 1000 > args.budget_ms:
+        print("Import time budget exceeded; import heavy dependencies in the fixtures and hooks which use them")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,23 @@
 import json
 import pytest
 import base64
-from ocp_resources.managed_cluster import ManagedCluster
-from ocp_resources.multi_cluster_observability import MultiClusterObservability
-from ocp_resources.secret import Secret
+import time
 from simple_logger.logger import get_logger
-from ocp_utilities.monitoring import Prometheus
+from pytest_testconfig import py_config
+
+from utilities.infra import get_managed_clusters_metadata
 
 LOGGER = get_logger(name=__name__)
+# Fleet health metrics (name: PromQL instant vector query), queried together in as few requests as possible
+FLEET_METRICS_QUERIES = {
+    "etcd_db_size": "etcd_debugging_mvcc_db_total_size_in_bytes",
+}
 
 
 @pytest.fixture(scope="session")
 def multi_cluster_observability(admin_client_scope_session):
+    from ocp_resources.multi_cluster_observability import MultiClusterObservability
+
     observability = MultiClusterObservability(
         client=admin_client_scope_session,
         name="observability",
@@ -28,6 +34,8 @@ def multi_cluster_observability(admin_client_scope_session):
 
 @pytest.fixture(scope="session")
 def rbac_query_proxy_bearer_token(admin_client_scope_session):
+    from ocp_resources.secret import Secret
+
     hub_cluster = "local-cluster"
     hub_cluster_secret = f"{hub_cluster}-cluster-secret"
 
@@ -42,40 +50,80 @@ def rbac_query_proxy_bearer_token(admin_client_scope_session):
 
 
 @pytest.fixture(scope="session")
-def etcd_metrics_query(admin_client_scope_session, rbac_query_proxy_bearer_token):
+def rbac_query_proxy_prometheus(admin_client_scope_session, rbac_query_proxy_bearer_token):
+    from ocp_utilities.monitoring import Prometheus
+
     return Prometheus(
         client=admin_client_scope_session,
         resource_name="rbac-query-proxy",
         namespace="open-cluster-management-observability",
         bearer_token=rbac_query_proxy_bearer_token,
-    ).query_sampler(query="etcd_debugging_mvcc_db_total_size_in_bytes")
+    )
 
 
 @pytest.fixture(scope="session")
-def clusters_etcd_metrics(etcd_metrics_query):
-    clusters_etcd_metrics = {}
+def observability_metrics_query_client(rbac_query_proxy_prometheus):
+    # Imported only when ACM observability tests run; it imports numpy and requests
+    from utilities.observability_metrics import PrometheusQueryClient
 
-    for metric_result in etcd_metrics_query:
-        clusters_etcd_metrics.setdefault(metric_result["metric"]["cluster"], []).append(metric_result["value"][0])
+    query_client = PrometheusQueryClient(prometheus=rbac_query_proxy_prometheus)
+    yield query_client
+    query_client.close()
 
-    assert clusters_etcd_metrics, "No clusters metrics found"
+
+@pytest.fixture(scope="session")
+def fleet_metrics(observability_metrics_query_client):
+    return observability_metrics_query_client.query(queries=FLEET_METRICS_QUERIES)
+
+
+@pytest.fixture(scope="session")
+def clusters_etcd_metrics(fleet_metrics):
+    clusters_etcd_metrics = fleet_metrics["etcd_db_size"]
+    assert len(clusters_etcd_metrics), "No clusters metrics found"
 
     return clusters_etcd_metrics
 
 
+@pytest.fixture(scope="session")
+def stale_etcd_metrics_clusters(observability_metrics_query_client):
+    from utilities.observability_metrics import get_stale_clusters
+
+    # Samples timestamps over the window, for all clusters in a single range query
+    window_end = time.time()
+    etcd_metrics_timestamps = observability_metrics_query_client.query_range(
+        queries={"etcd_db_size_timestamp": f"timestamp({FLEET_METRICS_QUERIES['etcd_db_size']})"},
+        start=window_end - py_config["acm_metrics_freshness_window"],
+        end=window_end,
+        step=py_config["acm_metrics_freshness_step"],
+    )["etcd_db_size_timestamp"]
+
+    return get_stale_clusters(
+        sample_timestamps=etcd_metrics_timestamps,
+        window_end=window_end,
+        max_age=py_config["acm_metrics_max_age"],
+        max_gap=py_config["acm_metrics_max_gap"],
+    )
+
+
 @pytest.fixture(scope="session")
 def observability_reported_clusters(clusters_etcd_metrics):
-    _observability_reported_clusters = [cluster_name for cluster_name in clusters_etcd_metrics]
-    LOGGER.info(f"Observability reported clusters: {_observability_reported_clusters}")
+    _observability_reported_clusters = clusters_etcd_metrics.clusters
+    LOGGER.info(f"Observability reported clusters: {len(_observability_reported_clusters)}")
 
     return _observability_reported_clusters
 
 
 @pytest.fixture(scope="session")
-def acm_clusters(admin_client_scope_session):
-    _acm_clusters = [cluster.name for cluster in ManagedCluster.get(dyn_client=admin_client_scope_session)]
+def acm_managed_clusters(admin_client_scope_session):
+    _acm_managed_clusters = get_managed_clusters_metadata(dyn_client=admin_client_scope_session)
+
+    assert _acm_managed_clusters, "No ACM clusters found"
+    return _acm_managed_clusters
 
-    assert _acm_clusters, "No ACM clusters found"
-    LOGGER.info(f"ACM clusters: {_acm_clusters}")
+
+@pytest.fixture(scope="session")
+def acm_clusters(acm_managed_clusters):
+    _acm_clusters = [managed_cluster.name for managed_cluster in acm_managed_clusters]
+    LOGGER.info(f"ACM clusters: {len(_acm_clusters)}")
 
     return _acm_clusters
@@ -1,29 +1,34 @@
 import pytest
 
 
-pytestmark = [pytest.mark.acm_observability, pytest.mark.usefixtures("multi_cluster_observability")]
+pytestmark = [
+    pytest.mark.acm_observability,
+    pytest.mark.usefixtures("multi_cluster_observability"),
+    pytest.mark.data_collector_scope(namespaces=["open-cluster-management-observability", "local-cluster"]),
+]
 
 
 class TestACMObservability:
     def test_all_clusters_metrics_reported(self, observability_reported_clusters, acm_clusters):
-        observability_missing_report_clusters = [
-            cluster for cluster in acm_clusters if cluster not in observability_reported_clusters
-        ]
+        from utilities.observability_metrics import get_missing_clusters
+
+        observability_missing_report_clusters = get_missing_clusters(
+            expected_clusters=acm_clusters, reported_clusters=observability_reported_clusters
+        )
         assert not observability_missing_report_clusters, (
-            "Not all ACM clusters "
-            f"are reported via observability: {observability_missing_report_clusters}, "
-            f"clusters expected: {acm_clusters}"
+            f"Not all ACM clusters ({len(acm_clusters)}) "
+            f"are reported via observability: {observability_missing_report_clusters}"
         )
 
-    def test_acm_clusters_etcd_metrics_exist_and_valid(self, clusters_etcd_metrics, observability_reported_clusters):
-        failed_acm_clusters = {}
-
-        for cluster_name in observability_reported_clusters:
-            # Checking given cluster's last etcd db size metric updated via observability
-            latest_etcd_db_size = clusters_etcd_metrics[cluster_name][-1]
-            if not (isinstance(latest_etcd_db_size, float) and latest_etcd_db_size > 0):
-                failed_acm_clusters[cluster_name] = latest_etcd_db_size
-
+    def test_acm_clusters_etcd_metrics_exist_and_valid(self, clusters_etcd_metrics):
+        # Checking each cluster's last etcd db size metric updated via observability
+        failed_acm_clusters = clusters_etcd_metrics.get_invalid_clusters()
         assert (
             not failed_acm_clusters
         ), f"The following ACM clusters etcd db size metric is invalid: {failed_acm_clusters}"
+
+    def test_acm_clusters_etcd_metrics_fresh(self, stale_etcd_metrics_clusters):
+        # Clusters whose observability agent reports late (latest sample too old, or gaps between samples)
+        assert (
+            not stale_etcd_metrics_clusters
+        ), f"The following ACM clusters etcd db size metric is stale: {stale_etcd_metrics_clusters}"
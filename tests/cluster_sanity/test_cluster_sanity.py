@@ -1,51 +1,32 @@
 import pytest
-from ocp_resources.node import Node
-from ocp_resources.pod import Pod
-from ocp_utilities.infra import get_client
 
-from utilities.infra import cluster_sanity
+from utilities.infra import cluster_sanity, multi_clusters_sanity
 
 
-@pytest.fixture()
-def admin_client_scope_function(kubeconfig_file_paths):
+@pytest.fixture(scope="session")
+def multi_clusters_sanity_results(request):
     """
-    Get DynamicClient
+    Run cluster sanity concurrently against all clusters passed in --kubeconfig-file-paths
     """
-    return get_client(config_file=kubeconfig_file_paths if kubeconfig_file_paths else None)
-
-
-@pytest.fixture(scope="session")
-def pods_scope_session(admin_client_scope_session):
-    return list(Pod.get(dyn_client=admin_client_scope_session))
-
-
-@pytest.fixture()
-def pods_scope_function(admin_client_scope_function):
-    return list(Pod.get(dyn_client=admin_client_scope_function))
-
-
-@pytest.fixture()
-def nodes_scope_function(admin_client_scope_function):
-    yield list(Node.get(dyn_client=admin_client_scope_function))
+    return multi_clusters_sanity(
+        kubeconfig_file_paths=request.config.getoption("--kubeconfig-file-paths").split(","),
+        max_workers=request.config.getoption("--cluster-sanity-max-workers"),
+        timeout=request.config.getoption("--cluster-sanity-timeout"),
+    )
 
 
 @pytest.mark.smoke
 @pytest.mark.smoke_single_cluster
-def test_cluster_sanity(nodes_scope_session, pods_scope_session, junitxml_plugin):
+def test_cluster_sanity(nodes_scope_session, admin_client_scope_session, junitxml_plugin):
     cluster_sanity(
         nodes=nodes_scope_session,
-        pods=pods_scope_session,
+        admin_client=admin_client_scope_session,
         junitxml_property=junitxml_plugin,
     )
 
 
 @pytest.mark.smoke_multi_cluster
-def test_multi_clusters_sanity(
-    nodes_scope_function,
-    pods_scope_function,
-):
-    cluster_sanity(
-        nodes=nodes_scope_function,
-        pods=pods_scope_function,
-        exit_pytest=False,
-    )
+def test_multi_clusters_sanity(kubeconfig_file_paths, multi_clusters_sanity_results):
+    cluster_sanity_exception = multi_clusters_sanity_results[kubeconfig_file_paths]
+    if cluster_sanity_exception:
+        raise cluster_sanity_exception
@@ -1,7 +1,6 @@
 import ast
 
 import pytest
-from ocp_resources.cluster_operator import ClusterOperator
 
 from tests.cluster_upgrade.utils import cluster_upgrade_policy_dict
 
@@ -33,6 +32,8 @@ def updated_upgrade_policies(ocm_client_scope_session, cluster, ocp_target_versi
 
 @pytest.fixture(scope="session")
 def upgradable_cloud_credentials_operator(cluster):
+    from ocp_resources.cluster_operator import ClusterOperator
+
     cloud_credential_name = "cloud-credential"
     cloud_credentials_operator = ClusterOperator(client=cluster.ocp_client, name=cloud_credential_name)
     cloud_credentials_operator_upgradeable_condition = [
@@ -4,6 +4,7 @@ from simple_logger.logger import get_logger
 from tests.cluster_upgrade.utils import (
     get_clusterversion,
     wait_for_cluster_version_state_and_version,
+    wait_for_ocm_cluster_version,
 )
 
 
@@ -28,4 +29,4 @@ def test_cluster_upgrade(
         target_ocp_version=ocp_target_version,
         collect_data=pytestconfig.getoption("--data-collector"),
     )
-    cluster.wait_for_ocm_cluster_version(ocp_target_version=ocp_target_version)
+    wait_for_ocm_cluster_version(cluster=cluster, ocp_target_version=ocp_target_version)
@@ -1,17 +1,17 @@
 from datetime import datetime, timedelta
 
 from dateutil.tz import tzutc
-from ocp_resources.cluster_operator import ClusterOperator
-from ocp_resources.cluster_version import ClusterVersion
-from timeout_sampler import TimeoutExpiredError, TimeoutSampler
-from ocp_wrapper_data_collector.data_collector import collect_resources_yaml_instance
+from timeout_sampler import TimeoutExpiredError
 from pytest_testconfig import py_config
 from simple_logger.logger import get_logger
 
+from utilities.infra import get_resource_api, wait_for_state
+
 
 LOGGER = get_logger(name=__name__)
 UPGRADE_SCHEDULE_DELTA = 10 * 60
 TIMEOUT_180MIN = 180 * 60
+TIMEOUT_10MIN = 10 * 60
 
 
 def cluster_upgrade_policy_dict(target_version):
@@ -33,30 +33,38 @@ def get_upgrade_next_run_time():
     return upgrade_next_run_time
 
 
+def cluster_version_state_and_version(cluster_version_instance):
+    cluster_version_status_history = cluster_version_instance.status.history[0]
+    return cluster_version_status_history.state, cluster_version_status_history.version
+
+
 def wait_for_cluster_version_state_and_version(cluster_version, target_ocp_version, collect_data):
-    def _cluster_version_state_and_version(_cluster_version, _target_ocp_version):
-        cluster_version_status_history = _cluster_version.instance.status.history[0]
-        LOGGER.info(f"clusterversion status.history: {cluster_version_status_history}")
-        return (
-            cluster_version_status_history.state == _cluster_version.Status.COMPLETED
-            and cluster_version_status_history.version == target_ocp_version
-        )
+    from ocp_resources.cluster_operator import ClusterOperator
+    from ocp_resources.cluster_version import ClusterVersion
+
+    cluster_version_api = get_resource_api(dyn_client=cluster_version.client, resource=ClusterVersion)
+
+    def _watch_cluster_version_state_and_version(timeout):
+        for event in cluster_version_api.watch(
+            field_selector=f"metadata.name=={cluster_version.name}",
+            timeout=timeout,
+        ):
+            yield cluster_version_state_and_version(cluster_version_instance=event["object"])
 
     try:
-        for sample in TimeoutSampler(
+        wait_for_state(
+            get_func=lambda: cluster_version_state_and_version(cluster_version_instance=cluster_version.instance),
+            condition_func=lambda state_and_version: (
+                state_and_version == (cluster_version.Status.COMPLETED, target_ocp_version)
+            ),
             wait_timeout=TIMEOUT_180MIN + UPGRADE_SCHEDULE_DELTA,
-            sleep=10,
-            func=_cluster_version_state_and_version,
-            _cluster_version=cluster_version,
-            _target_ocp_version=target_ocp_version,
-        ):
-            if sample:
-                return
+            watch_func=_watch_cluster_version_state_and_version,
+        )
 
     except TimeoutExpiredError:
         LOGGER.error(
             "Timeout reached while upgrading OCP."
-            "clusterversion conditions: {cluster_version.instance.status.conditions}"
+            f"clusterversion conditions: {cluster_version.instance.status.conditions}"
         )
         collect_resources(
             collect_data=collect_data,
@@ -65,12 +73,39 @@ def wait_for_cluster_version_state_and_version(cluster_version, target_ocp_versi
         raise
 
 
+def wait_for_ocm_cluster_version(cluster, ocp_target_version):
+    LOGGER.info(f"Wait for cluster {cluster.name} version to be {ocp_target_version} in OCM.")
+    # OCM has no watch API; poll with adaptive backoff
+    try:
+        wait_for_state(
+            get_func=lambda: cluster.instance.version.raw_id,
+            condition_func=lambda version: version == ocp_target_version,
+            wait_timeout=TIMEOUT_10MIN,
+        )
+    except TimeoutExpiredError:
+        LOGGER.error(
+            f"Cluster {cluster.name} version {cluster.instance.version.raw_id} does not"
+            f" match expected {ocp_target_version} version"
+        )
+        raise
+
+
 def get_clusterversion(dyn_client):
+    from ocp_resources.cluster_version import ClusterVersion
+
     for cluster_version in ClusterVersion.get(dyn_client=dyn_client):
         return cluster_version
 
 
 def collect_resources(collect_data, resources_to_collect):
     if collect_data:
-        base_directory = py_config["data_collector"]["data_collector_base_directory"]
-        collect_resources_yaml_instance(resources_to_collect=resources_to_collect, base_directory=base_directory)
+        from utilities.data_collector import collect_cluster_data
+
+        data_collector_dict = py_config["data_collector"]
+        collect_cluster_data(
+            collector_directory=data_collector_dict.get(
+                "collector_directory", data_collector_dict["data_collector_base_directory"]
+            ),
+            data_collector_dict=data_collector_dict,
+            resources=resources_to_collect,
+        )
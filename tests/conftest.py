@@ -1,13 +1,11 @@
 import os
 
 import pytest
-import rosa.cli
-from ocm_python_wrapper.cluster import Cluster
-from ocp_resources.node import Node
-from ocp_utilities.infra import get_client
+from pytest_testconfig import py_config
 from simple_logger.logger import get_logger
 
-from utilities.infra import get_ocm_client
+from utilities.rosa_cache import get_cached_rosa_result
+from utilities.session_snapshot import get_session_snapshot
 
 
 LOGGER = get_logger(name=__name__)
@@ -22,12 +20,41 @@ def admin_client_scope_session():
     """
     Get DynamicClient
     """
+    from ocp_utilities.infra import get_client
+
     return get_client()
 
 
 @pytest.fixture(scope="session")
-def nodes_scope_session(admin_client_scope_session):
-    yield list(Node.get(dyn_client=admin_client_scope_session))
+def cluster_state_cache_scope_session(admin_client_scope_session):
+    """
+    Watch-backed cache of Nodes, Pods, ClusterVersion and ClusterOperators, shared by fixtures and hooks.
+    Each kind is listed and watched only once something asks for it.
+    """
+    from utilities.cluster_state import ClusterStateCache
+
+    cluster_state_cache = ClusterStateCache(dyn_client=admin_client_scope_session)
+    cluster_state_cache.start()
+    yield cluster_state_cache
+    cluster_state_cache.stop()
+
+
+@pytest.fixture(scope="session")
+def nodes_scope_session(request):
+    from kubernetes.dynamic.resource import ResourceInstance
+    from ocp_resources.node import Node
+
+    from utilities.cluster_state import CachedResource
+
+    def _nodes():
+        cluster_state_cache = request.getfixturevalue("cluster_state_cache_scope_session")
+        return [node.instance.to_dict() for node in cluster_state_cache.get(resource=Node)]
+
+    # Under xdist, nodes are listed by a single worker and shared with the others
+    yield [
+        CachedResource(resource=Node, instance=ResourceInstance(client=None, instance=node))
+        for node in get_session_snapshot(config=request.config, name="nodes", func=_nodes)
+    ]
 
 
 @pytest.fixture(scope="session")
@@ -39,11 +66,15 @@ def cluster_name_scope_session(request):
 
 @pytest.fixture(scope="session")
 def cluster(ocm_client_scope_session, cluster_name_scope_session):
+    from ocm_python_wrapper.cluster import Cluster
+
     return Cluster(client=ocm_client_scope_session, name=cluster_name_scope_session)
 
 
 @pytest.fixture(scope="session")
 def ocm_client_scope_session(ocm_token):
+    from utilities.infra import get_ocm_client
+
     return get_ocm_client(token=ocm_token)
 
 
@@ -64,17 +95,39 @@ def ocp_target_version(request):
 
 
 @pytest.fixture(scope="session")
-def rosa_regions(ocm_client_scope_session, rosa_allowed_commands):
-    # A region (any region) is required for ROSA commands
-    return rosa.cli.execute(
-        command="list regions",
-        allowed_commands=rosa_allowed_commands,
-        aws_region="us-west-2",
-        ocm_client=ocm_client_scope_session,
-    )["out"]
+def rosa_regions(request, rosa_allowed_commands):
+    def _list_regions():
+        import rosa.cli
+
+        # A region (any region) is required for ROSA commands
+        return rosa.cli.execute(
+            command="list regions",
+            allowed_commands=rosa_allowed_commands,
+            aws_region="us-west-2",
+            # Only needed (and created) when regions are not cached
+            ocm_client=request.getfixturevalue("ocm_client_scope_session"),
+        )["out"]
+
+    return get_session_snapshot(
+        config=request.config,
+        name="rosa_regions",
+        func=lambda: get_cached_rosa_result(
+            name="list_regions", func=_list_regions, key_parts=[py_config["ocm_api_server"]]
+        ),
+    )
 
 
 @pytest.fixture(scope="session")
-def rosa_allowed_commands():
+def rosa_allowed_commands(request):
+    def _parse_help():
+        # Imported on cache miss only
+        import rosa.cli
+
+        return rosa.cli.parse_help()
+
     # Get ROSA allowed commands to save execution time
-    return rosa.cli.parse_help()
+    return get_session_snapshot(
+        config=request.config,
+        name="rosa_allowed_commands",
+        func=lambda: get_cached_rosa_result(name="parse_help", func=_parse_help),
+    )
@@ -2,12 +2,18 @@ global config
 
 
 ocm_api_server = "production"
+ocm_sso_token_endpoint = "https://sso.redhat.com/auth/realms/redhat-external/protocol/openid-connect/token"
 aws_region = None
 openshift_channel_group = "candidate"
 aws_compute_machine_type = "m5.xlarge"
 rosa_number_of_nodes = 2
 cloud_provider = "aws"
 kubeadmin_token = None  # Needed for acm_observability tests
+# ACM observability metrics freshness, in seconds; the metrics collector default interval is 5 minutes
+acm_metrics_freshness_window = 3600
+acm_metrics_freshness_step = 60
+acm_metrics_max_age = 600
+acm_metrics_max_gap = 600
 # Needed for rosa login when running in openshift.ci; need to be set to a directory with write permissions ("/tmp")
 home_dir = None
 
@@ -1,10 +1,5 @@
-import openshift_cli_installer.cli
 import pytest
 import shortuuid
-from click.testing import CliRunner
-from clouds.aws.aws_utils import get_least_crowded_aws_vpc_region
-from ocm_python_wrapper.cluster import Cluster
-from ocp_utilities.operators import install_operator, uninstall_operator
 from pytest_testconfig import py_config
 from simple_logger.logger import get_logger
 
@@ -37,6 +32,8 @@ def aws_region(rosa_hypershift_regions):
             return pyconfig_aws_region
         raise ValueError(f"{pyconfig_aws_region} is not supported, supported regions:" f" {rosa_hypershift_regions}")
     # If a region was not passed, use a hypershift-enabled region with the lowest number of used VPCs
+    from clouds.aws.aws_utils import get_least_crowded_aws_vpc_region
+
     return get_least_crowded_aws_vpc_region(region_list=rosa_hypershift_regions)
 
 
@@ -83,11 +80,15 @@ def destroy_cluster_cmd(cluster_cmd):
 
 @pytest.fixture(scope="class")
 def click_runner():
+    from click.testing import CliRunner
+
     return CliRunner(mix_stderr=False)
 
 
 @pytest.fixture(scope="class")
 def cluster_scope_class(ocm_client_scope_session, cluster_name_scope_class):
+    from ocm_python_wrapper.cluster import Cluster
+
     return Cluster(client=ocm_client_scope_session, name=cluster_name_scope_class)
 
 
@@ -97,6 +98,8 @@ class TestHypershiftCluster:
 
     @pytest.mark.dependency(name="test_hypershift_cluster_installation")
     def test_hypershift_create_cluster(self, create_cluster_cmd, click_runner):
+        import openshift_cli_installer.cli
+
         result = click_runner.invoke(
             cli=openshift_cli_installer.cli.main,
             args=create_cluster_cmd,
@@ -109,6 +112,8 @@ class TestHypershiftCluster:
 
     @pytest.mark.dependency(name="test_install_operator", depends=["test_hypershift_cluster_installation"])
     def test_install_operator(self, cluster_scope_class):
+        from ocp_utilities.operators import install_operator
+
         install_operator(
             admin_client=cluster_scope_class.ocp_client,
             name=TestHypershiftCluster.OPERATOR_NAME,
@@ -119,6 +124,8 @@ class TestHypershiftCluster:
 
     @pytest.mark.dependency(depends=["test_install_operator"])
     def test_uninstall_operator(self, cluster_scope_class):
+        from ocp_utilities.operators import uninstall_operator
+
         uninstall_operator(
             admin_client=cluster_scope_class.ocp_client,
             name=TestHypershiftCluster.OPERATOR_NAME,
@@ -127,6 +134,8 @@ class TestHypershiftCluster:
 
     @pytest.mark.dependency(depends=["test_hypershift_cluster_installation"])
     def test_hypershift_destroy_cluster(self, destroy_cluster_cmd, click_runner):
+        import openshift_cli_installer.cli
+
         result = click_runner.invoke(
             cli=openshift_cli_installer.cli.main,
             args=destroy_cluster_cmd,
@@ -0,0 +1,348 @@
+import functools
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import defaultdict, deque
+from urllib.parse import parse_qsl, urlparse
+
+import zstandard
+from simple_logger.logger import get_logger
+
+
+LOGGER = get_logger(name=__name__)
+RECORD_MODE = "record"
+REPLAY_MODE = "replay"
+CASSETTE_INDEX_FILE_NAME = "index.jsonl"
+BODIES_DIRECTORY_NAME = "bodies"
+# Query parameters which change between runs of the same test, e.g. pod logs since the test started
+VOLATILE_QUERY_PARAMETERS = ("sinceSeconds",)
+REPLAY_ACCESS_TOKEN = "replay"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ApiCassetteMissError(Exception):
+    pass
+
+
+def get_request_key(client_name, method, url, fields=None, body=None):
+    """
+    Args:
+        client_name (str): API client name
+        method (str): HTTP method
+        url (str): request URL
+        fields (list|dict, optional): request query or form fields
+        body (str|bytes, optional): request body
+
+    Returns:
+        str: request key; requests with the same key are replayed in the order they were recorded
+    """
+    parsed_url = urlparse(url)
+    fields = fields.items() if isinstance(fields, dict) else fields or []
+    query = sorted(
+        (name, str(value))
+        for name, value in [*parse_qsl(parsed_url.query), *fields]
+        if name not in VOLATILE_QUERY_PARAMETERS
+    )
+    if isinstance(body, str):
+        body = body.encode()
+
+    body_digest = hashlib.sha256(body).hexdigest() if body else None
+    return json.dumps([client_name, method.upper(), f"{parsed_url.netloc}{parsed_url.path}", query, body_digest])
+
+
+class ReplayResponse:
+    """
+    Recorded response, with the urllib3 HTTPResponse attributes and methods used by the generated API clients.
+    """
+
+    def __init__(self, status, reason, headers, data):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.data = data
+        self._position = 0
+
+    def getheaders(self):
+        return self.headers
+
+    def getheader(self, name, default=None):
+        for header_name, value in self.headers.items():
+            if header_name.lower() == name.lower():
+                return value
+
+        return default
+
+    def read(self, amt=None, **kwargs):
+        end = len(self.data) if amt is None else self._position + amt
+        chunk = self.data[self._position : end]
+        self._position += len(chunk)
+        return chunk
+
+    def stream(self, amt=STREAM_CHUNK_SIZE, decode_content=None):
+        while True:
+            chunk = self.read(amt=amt or STREAM_CHUNK_SIZE)
+            if not chunk:
+                return
+
+            yield chunk
+
+    def release_conn(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class RecordingResponse:
+    """
+    Streamed (not preloaded) response, recorded once the client has read it, e.g. a watch or pod log stream.
+    """
+
+    def __init__(self, response, on_complete):
+        self._response = response
+        self._on_complete = on_complete
+        self._chunks = []
+        self._recorded = False
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    @property
+    def data(self):
+        # Read whole, e.g. by the DynamicClient, which requests responses without preloading them
+        data = self._response.data
+        self._chunks.append(data)
+        self._record()
+        return data
+
+    def read(self, *args, **kwargs):
+        chunk = self._response.read(*args, **kwargs)
+        self._chunks.append(chunk)
+        return chunk
+
+    def stream(self, *args, **kwargs):
+        for chunk in self._response.stream(*args, **kwargs):
+            self._chunks.append(chunk)
+            yield chunk
+
+        self._record()
+
+    def release_conn(self):
+        self._record()
+        return self._response.release_conn()
+
+    def close(self):
+        self._record()
+        return self._response.close()
+
+    def _record(self):
+        if not self._recorded:
+            self._recorded = True
+            self._on_complete(data=b"".join(self._chunks))
+
+
+class CassettePoolManager:
+    """
+    Stand-in for a generated API client's urllib3 pool manager, which records or replays its requests.
+
+    The client builds requests, raises API exceptions and deserializes responses as usual.
+    """
+
+    def __init__(self, pool_manager, api_cassette, client_name):
+        self._pool_manager = pool_manager
+        self.api_cassette = api_cassette
+        self.client_name = client_name
+
+    def __getattr__(self, name):
+        return getattr(self._pool_manager, name)
+
+    def request(self, method, url, fields=None, headers=None, **kwargs):
+        key = get_request_key(
+            client_name=self.client_name, method=method, url=url, fields=fields, body=kwargs.get("body")
+        )
+        if self.api_cassette.mode == REPLAY_MODE:
+            return self.api_cassette.replay(key=key)
+
+        response = self._pool_manager.request(method, url, fields=fields, headers=headers, **kwargs)
+        record = functools.partial(
+            self.api_cassette.record,
+            key=key,
+            status=response.status,
+            reason=response.reason,
+            headers=response.headers,
+        )
+        if kwargs.get("preload_content", True):
+            record(data=response.data)
+            return response
+
+        return RecordingResponse(response=response, on_complete=record)
+
+
+def patch_rest_client(rest_client_class, client_name):
+    """
+    Route the pool manager of every `rest_client_class` client created while a cassette is active through it.
+
+    Args:
+        rest_client_class (type): generated API client RESTClientObject class
+        client_name (str): API client name, part of the request key
+    """
+    if getattr(rest_client_class.__init__, "api_cassette", False):
+        return
+
+    original_init = rest_client_class.__init__
+
+    @functools.wraps(original_init)
+    def __init__(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        api_cassette = ApiCassette.active
+        if api_cassette:
+            self.pool_manager = CassettePoolManager(
+                pool_manager=self.pool_manager, api_cassette=api_cassette, client_name=client_name
+            )
+
+    __init__.api_cassette = True
+    rest_client_class.__init__ = __init__
+
+
+def patch_dynamic_client(dynamic_client_class):
+    """
+    Point the API discovery cache of every `dynamic_client_class` client created while a cassette is active to a
+    file private to the cassette session, instead of the host-wide `$TMPDIR/osrcp-<host hash>.json` file; API
+    discovery is then recorded and replayed like any other request.
+
+    Args:
+        dynamic_client_class (type): kubernetes DynamicClient class
+    """
+    if getattr(dynamic_client_class.__init__, "api_cassette", False):
+        return
+
+    original_init = dynamic_client_class.__init__
+
+    @functools.wraps(original_init)
+    def __init__(self, client, cache_file=None, **kwargs):
+        api_cassette = ApiCassette.active
+        if api_cassette and not cache_file:
+            cache_file = api_cassette.get_discovery_cache_file(host=client.configuration.host)
+
+        original_init(self, client, cache_file=cache_file, **kwargs)
+
+    __init__.api_cassette = True
+    dynamic_client_class.__init__ = __init__
+
+
+class ReplayAccessTokenCache:
+    """
+    OCM access token for replayed sessions, which must not reach SSO.
+    """
+
+    def get_access_token(self, rejected_token=None):
+        return REPLAY_ACCESS_TOKEN
+
+
+class ApiCassette:
+    """
+    Kubernetes and OCM API requests and responses, recorded during a session and replayed in later sessions.
+
+    The cassette is a directory: `index.jsonl` holds one line per response (request key, status, reason, content
+    type and body digest), and response bodies are stored once per unique content, zstd-compressed, under `bodies`.
+    Replayed requests get the responses recorded for the same request key, in recording order; once exhausted, the
+    last response is repeated (e.g. for polling).
+    """
+
+    # Cassette started by pytest_sessionstart; read by the patched API clients
+    active = None
+
+    def __init__(self, cassette_directory, mode):
+        self.cassette_directory = cassette_directory
+        self.mode = mode
+        self.bodies_directory = os.path.join(cassette_directory, BODIES_DIRECTORY_NAME)
+        self.discovery_cache_directory = None
+        self._responses = defaultdict(deque)
+        self._index_file = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Imported only when a cassette is used
+        from kubernetes.client import rest as kubernetes_rest
+        from kubernetes.dynamic import DynamicClient
+        from ocm_python_client import rest as ocm_rest
+
+        self.discovery_cache_directory = tempfile.mkdtemp(prefix="api-cassette-discovery-")
+        if self.mode == RECORD_MODE:
+            os.makedirs(self.bodies_directory, exist_ok=True)
+            self._index_file = open(os.path.join(self.cassette_directory, CASSETTE_INDEX_FILE_NAME), "w")
+        else:
+            with open(os.path.join(self.cassette_directory, CASSETTE_INDEX_FILE_NAME)) as fd:
+                for line in fd:
+                    entry = json.loads(line)
+                    self._responses[entry["key"]].append(entry)
+
+            LOGGER.info(f"Replaying {len(self._responses)} API requests from {self.cassette_directory}")
+
+        patch_rest_client(rest_client_class=kubernetes_rest.RESTClientObject, client_name="kubernetes")
+        patch_rest_client(rest_client_class=ocm_rest.RESTClientObject, client_name="ocm")
+        patch_dynamic_client(dynamic_client_class=DynamicClient)
+        ApiCassette.active = self
+
+    def stop(self):
+        if ApiCassette.active is self:
+            ApiCassette.active = None
+
+        with self._lock:
+            if self._index_file:
+                self._index_file.close()
+                self._index_file = None
+
+        if self.discovery_cache_directory:
+            shutil.rmtree(self.discovery_cache_directory, ignore_errors=True)
+
+    def get_discovery_cache_file(self, host):
+        """
+        Args:
+            host (str): Kubernetes API server URL
+
+        Returns:
+            str: API discovery cache file path for the cassette session, one per API server
+        """
+        return os.path.join(self.discovery_cache_directory, f"{hashlib.sha256(host.encode()).hexdigest()}.json")
+
+    def record(self, key, status, reason, headers, data):
+        digest = hashlib.sha256(data).hexdigest()
+        body_file = os.path.join(self.bodies_directory, f"{digest}.zst")
+        with self._lock:
+            if not self._index_file:
+                # Response finished after the cassette was stopped, e.g. by a thread still running
+                return
+
+            if not os.path.exists(body_file):
+                with open(body_file, "wb") as fd:
+                    fd.write(zstandard.ZstdCompressor().compress(data))
+
+            self._index_file.write(
+                json.dumps({
+                    "key": key,
+                    "status": status,
+                    "reason": reason,
+                    "content_type": headers.get("Content-Type"),
+                    "body": digest,
+                })
+                + "\n"
+            )
+            self._index_file.flush()
+
+    def replay(self, key):
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                raise ApiCassetteMissError(f"No recorded response in {self.cassette_directory} for request {key}")
+
+            entry = responses.popleft() if len(responses) > 1 else responses[0]
+
+        with open(os.path.join(self.bodies_directory, f"{entry['body']}.zst"), "rb") as fd:
+            data = zstandard.ZstdDecompressor().decompress(fd.read())
+
+        headers = {"Content-Type": entry["content_type"]} if entry["content_type"] else {}
+        return ReplayResponse(status=entry["status"], reason=entry["reason"], headers=headers, data=data)
@@ -0,0 +1,38 @@
+import os
+import stat
+
+from simple_logger.logger import get_logger
+
+
+LOGGER = get_logger(name=__name__)
+PRIVATE_DIRECTORY_MODE = 0o700
+
+
+def ensure_private_cache_directory(directory):
+    """
+    Create a cache directory which only the current user can access, or validate an existing one.
+
+    Cache directories have predictable names under the shared temporary directory; a directory created by another
+    user, or a symbolic link planted in its place, could be used to read or plant cached data, so it is not used.
+
+    Args:
+        directory (str): cache directory path
+
+    Returns:
+        bool: True if the directory is owned by the current user and not accessible by group or others
+    """
+    try:
+        os.mkdir(directory, mode=PRIVATE_DIRECTORY_MODE)
+    except FileExistsError:
+        pass
+
+    directory_stat = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(directory_stat.st_mode)
+        or directory_stat.st_uid != os.getuid()
+        or stat.S_IMODE(directory_stat.st_mode) & 0o077
+    ):
+        LOGGER.warning(f"{directory} is not a directory private to the current user, the cache is not used")
+        return False
+
+    return True
@@ -0,0 +1,189 @@
+import threading
+import time
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+from kubernetes.dynamic.exceptions import DynamicApiError
+from ocp_resources.cluster_operator import ClusterOperator
+from ocp_resources.cluster_version import ClusterVersion
+from ocp_resources.node import Node
+from ocp_resources.pod import Pod
+from simple_logger.logger import get_logger
+
+from utilities.infra import get_resource_api, get_resource_pages
+
+
+LOGGER = get_logger(name=__name__)
+HTTP_STATUS_GONE = 410
+WATCH_TIMEOUT = 60
+WATCH_RETRY_INTERVAL = 5
+# Watch threads are daemons; do not hold session teardown for a watch stuck on a quiet stream
+WATCH_STOP_TIMEOUT = 5
+
+
+class CachedResource:
+    """
+    Read-only view of a resource held in ClusterStateCache.
+
+    Exposes `name`, `namespace`, `exists` and `instance` like ocp_resources objects do, so it can be passed to
+    ocp_utilities checks without fetching the resource from the cluster again.
+    """
+
+    def __init__(self, resource, instance):
+        self.resource = resource
+        self.instance = instance
+        self.name = instance.metadata.name
+        self.namespace = instance.metadata.namespace
+        self.exists = True
+
+    def __getattr__(self, name):
+        # Resource class constants, e.g. Status and Condition
+        return getattr(self.resource, name)
+
+
+class ClusterStateCache:
+    """
+    Watch-backed cache of cluster resources, shared by session fixtures and pytest hooks.
+
+    Each resource kind is listed (page by page) on first use and then kept up to date by a watch started from the
+    list resourceVersion, so kinds nobody asks for (e.g. Pods when no test fails) are never listed. When the watch
+    resourceVersion expires (410 Gone), the resource kind is listed again.
+    """
+
+    # Cache started by the session fixture; read by pytest hooks, which cannot request fixtures
+    active = None
+
+    def __init__(self, dyn_client, resources=(Node, Pod, ClusterVersion, ClusterOperator)):
+        self.dyn_client = dyn_client
+        self.resources = resources
+        self._items = {resource.kind: {} for resource in resources}
+        self._resource_versions = {}
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._watchers = {}
+
+    def start(self):
+        ClusterStateCache.active = self
+
+    def stop(self):
+        self._stop_event.set()
+        with self._start_lock:
+            for watcher in self._watchers.values():
+                watcher.stop()
+
+            for thread in self._threads:
+                thread.join(timeout=WATCH_STOP_TIMEOUT)
+
+        if ClusterStateCache.active is self:
+            ClusterStateCache.active = None
+
+    def get(self, resource):
+        """
+        Args:
+            resource (Resource): ocp_resources resource class, e.g. Node
+
+        Returns:
+            list: CachedResource objects, a snapshot of the resources currently in the cache
+        """
+        self._start_resource(resource=resource)
+        with self._lock:
+            instances = list(self._items[resource.kind].values())
+
+        return [CachedResource(resource=resource, instance=instance) for instance in instances]
+
+    def _start_resource(self, resource):
+        with self._start_lock:
+            if resource.kind in self._watchers or self._stop_event.is_set():
+                return
+
+            self._list(resource=resource)
+            self._watchers[resource.kind] = watch.Watch()
+            thread = threading.Thread(
+                target=self._watch,
+                kwargs={"resource": resource},
+                name=f"cluster-state-{resource.kind}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _list(self, resource):
+        items = {}
+        page = None
+        for page in get_resource_pages(dyn_client=self.dyn_client, resource=resource):
+            for item in page.items:
+                items[(item.metadata.namespace, item.metadata.name)] = item
+
+        with self._lock:
+            self._items[resource.kind] = items
+            self._resource_versions[resource.kind] = page.metadata.resourceVersion
+
+        LOGGER.info(f"Cluster state cache: listed {len(items)} {resource.kind} resources")
+
+    def _watch(self, resource):
+        resource_api = get_resource_api(dyn_client=self.dyn_client, resource=resource)
+        while not self._stop_event.is_set():
+            window_start = time.monotonic()
+            events = 0
+            try:
+                for event in resource_api.watch(
+                    resource_version=self._resource_versions[resource.kind],
+                    timeout=WATCH_TIMEOUT,
+                    watcher=self._watchers[resource.kind],
+                ):
+                    events += 1
+                    if event["type"] == "ERROR":
+                        if event["raw_object"].get("code") == HTTP_STATUS_GONE:
+                            self._resync(resource=resource)
+                            break
+
+                        raise ApiException(status=event["raw_object"].get("code"), reason=event["raw_object"])
+
+                    self._apply_event(resource=resource, event=event)
+                    if self._stop_event.is_set():
+                        return
+
+                if not events and time.monotonic() - window_start < WATCH_TIMEOUT:
+                    # The server ended the watch early without events; do not watch again in a busy loop
+                    self._stop_event.wait(timeout=WATCH_RETRY_INTERVAL)
+
+            except (ApiException, DynamicApiError) as ex:
+                if ex.status == HTTP_STATUS_GONE:
+                    self._resync(resource=resource)
+                    continue
+
+                LOGGER.warning(f"Cluster state cache: {resource.kind} watch failed, retrying: {ex}")
+                self._stop_event.wait(timeout=WATCH_RETRY_INTERVAL)
+
+            except Exception as ex:
+                if self._stop_event.is_set():
+                    # Watch stream closed by stop()
+                    return
+
+                LOGGER.warning(f"Cluster state cache: {resource.kind} watch dropped, retrying: {ex}")
+                self._stop_event.wait(timeout=WATCH_RETRY_INTERVAL)
+
+    def _resync(self, resource):
+        LOGGER.info(f"Cluster state cache: {resource.kind} watch expired, re-listing")
+        while not self._stop_event.is_set():
+            try:
+                self._list(resource=resource)
+                return
+            except Exception as ex:
+                LOGGER.warning(f"Cluster state cache: failed to list {resource.kind}, retrying: {ex}")
+                self._stop_event.wait(timeout=WATCH_RETRY_INTERVAL)
+
+    def _apply_event(self, resource, event):
+        _object = event["object"]
+        with self._lock:
+            self._resource_versions[resource.kind] = _object.metadata.resourceVersion
+            if event["type"] == "BOOKMARK":
+                return
+
+            key = (_object.metadata.namespace, _object.metadata.name)
+            if event["type"] == "DELETED":
+                self._items[resource.kind].pop(key, None)
+            else:
+                self._items[resource.kind][key] = _object
@@ -0,0 +1,525 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+import yaml
+import zstandard
+from ocp_resources.node import Node
+from ocp_resources.pod import Pod
+from ocp_resources.resource import NamespacedResource
+from ocp_utilities.infra import get_client
+from simple_logger.logger import get_logger
+
+from utilities.cluster_state import ClusterStateCache
+from utilities.infra import get_resource_pages
+
+
+LOGGER = get_logger(name=__name__)
+LOG_CHUNK_SIZE = 64 * 1024
+DEFAULT_COLLECT_PODS_MAX_WORKERS = 10
+DEFAULT_COLLECT_POD_TIMEOUT = 60
+DEFAULT_COLLECT_PODS_TOTAL_TIMEOUT = 300
+OBJECTS_DIRECTORY_NAME = "objects"
+ARCHIVE_FILE_NAME = "collected-info.tar.zst"
+ARCHIVE_INDEX_FILE_SUFFIX = ".index.jsonl"
+
+
+class ContentStore:
+    """
+    Content-addressed store for collected data.
+
+    Each unique content is stored once, as `<base_directory>/objects/<digest[:2]>/<digest>` (sha256 of the
+    uncompressed content); collected files are relative symbolic links to the stored objects. Data which is
+    identical across failures (e.g. nodes YAML) is stored once, regardless of the number of failures.
+    """
+
+    def __init__(self, base_directory):
+        self.objects_directory = os.path.join(base_directory, OBJECTS_DIRECTORY_NAME)
+
+    def write(self, file_path, content):
+        self.write_chunks(file_path=file_path, chunks=[content.encode()])
+
+    def write_chunks(self, file_path, chunks, compress=False):
+        """
+        Args:
+            file_path (str): collected file path, created as a link to the stored object
+            chunks (iterable): content bytes chunks, written as they are consumed
+            compress (bool): store the object gzip-compressed
+        """
+        os.makedirs(self.objects_directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.objects_directory, delete=False) as tmp_file:
+            try:
+                object_name = spool_chunks(chunks=chunks, fileobj=tmp_file, compress=compress)
+            except Exception:
+                os.remove(tmp_file.name)
+                raise
+
+        object_path = os.path.join(self.objects_directory, object_name)
+        if os.path.exists(object_path):
+            os.remove(tmp_file.name)
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(tmp_file.name, object_path)
+
+        file_directory = os.path.dirname(file_path)
+        os.makedirs(file_directory, exist_ok=True)
+        if os.path.lexists(file_path):
+            os.remove(file_path)
+
+        os.symlink(os.path.relpath(object_path, file_directory), file_path)
+
+    def close(self):
+        pass
+
+
+class ArchiveContentStore(ContentStore):
+    """
+    Content-addressed store which streams collected data into a single zstd-compressed tar archive.
+
+    Objects and the links referencing them are tar members of `<base_directory>/collected-info.tar.zst`; extracting
+    the archive gives the same tree as the directory store. Every member is written as an independent zstd frame
+    and flushed, so the archive is readable up to the last member even if pytest exits abruptly.
+    `collected-info.tar.zst.index.jsonl` holds each member name with its frame offset and length, so a single
+    member can be read without decompressing the whole archive.
+
+    Writes after `close` are dropped, e.g. from pods data collection workers still running when the session ends.
+    """
+
+    def __init__(self, base_directory, archive_file_name=ARCHIVE_FILE_NAME):
+        super().__init__(base_directory=base_directory)
+        self.base_directory = base_directory
+        os.makedirs(base_directory, exist_ok=True)
+        self.archive_file = open(os.path.join(base_directory, archive_file_name), "wb")
+        self.index_file = open(os.path.join(base_directory, f"{archive_file_name}{ARCHIVE_INDEX_FILE_SUFFIX}"), "w")
+        self.compressor = zstandard.ZstdCompressor()
+        self.stored_objects = set()
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def write_chunks(self, file_path, chunks, compress=False):
+        link_name = os.path.relpath(file_path, self.base_directory)
+        with tempfile.TemporaryFile() as tmp_file:
+            object_name = os.path.join(
+                OBJECTS_DIRECTORY_NAME, spool_chunks(chunks=chunks, fileobj=tmp_file, compress=compress)
+            )
+            with self.lock:
+                if self.closed:
+                    LOGGER.warning(f"Collected data archive is closed, {link_name} is not stored")
+                    return
+
+                if object_name not in self.stored_objects:
+                    object_tarinfo = tarfile.TarInfo(name=object_name)
+                    object_tarinfo.size = tmp_file.tell()
+                    object_tarinfo.mtime = int(time.time())
+                    tmp_file.seek(0)
+                    self.add_member(tarinfo=object_tarinfo, fileobj=tmp_file)
+                    self.stored_objects.add(object_name)
+
+                link_tarinfo = tarfile.TarInfo(name=link_name)
+                link_tarinfo.type = tarfile.SYMTYPE
+                link_tarinfo.linkname = os.path.relpath(object_name, os.path.dirname(link_name))
+                link_tarinfo.mtime = int(time.time())
+                self.add_member(tarinfo=link_tarinfo)
+
+    def add_member(self, tarinfo, fileobj=None):
+        offset = self.archive_file.tell()
+        with self.compressor.stream_writer(self.archive_file, closefd=False) as writer:
+            writer.write(tarinfo.tobuf(format=tarfile.PAX_FORMAT))
+            if fileobj:
+                shutil.copyfileobj(fileobj, writer, LOG_CHUNK_SIZE)
+                remainder = tarinfo.size % tarfile.BLOCKSIZE
+                if remainder:
+                    writer.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+
+        self.archive_file.flush()
+        self.index_file.write(
+            json.dumps({"name": tarinfo.name, "offset": offset, "length": self.archive_file.tell() - offset}) + "\n"
+        )
+        self.index_file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+
+            self.closed = True
+            # End-of-archive marker
+            self.archive_file.write(self.compressor.compress(tarfile.NUL * tarfile.BLOCKSIZE * 2))
+            self.archive_file.close()
+            self.index_file.close()
+
+
+def spool_chunks(chunks, fileobj, compress):
+    """
+    Write content chunks into a file object, hashing the uncompressed content.
+
+    Args:
+        chunks (iterable): content bytes chunks
+        fileobj (file): file object to write to
+        compress (bool): gzip-compress the content
+
+    Returns:
+        str: object name, `<digest[:2]>/<sha256>` (with `.gz` suffix if compressed)
+    """
+    digest = hashlib.sha256()
+    with gzip.GzipFile(fileobj=fileobj, mode="wb", mtime=0) if compress else nullcontext(fileobj) as fd:
+        for chunk in chunks:
+            digest.update(chunk)
+            fd.write(chunk)
+
+    hexdigest = digest.hexdigest()
+    return os.path.join(hexdigest[:2], f"{hexdigest}.gz" if compress else hexdigest)
+
+
+def get_content_store(data_collector_dict):
+    """
+    Get the session content store, created on first use.
+
+    The store streams into a single archive if `collect_data_archive` is set in the data collector YAML.
+
+    Args:
+        data_collector_dict (dict): data collector configuration
+
+    Returns:
+        ContentStore: session content store
+    """
+    if not data_collector_dict.get("content_store"):
+        base_directory = data_collector_dict["data_collector_base_directory"]
+        if data_collector_dict.get("collect_data_archive"):
+            data_collector_dict["content_store"] = ArchiveContentStore(
+                base_directory=base_directory,
+                archive_file_name=data_collector_dict.get("archive_file_name", ARCHIVE_FILE_NAME),
+            )
+        else:
+            data_collector_dict["content_store"] = ContentStore(base_directory=base_directory)
+
+    return data_collector_dict["content_store"]
+
+
+def get_pytest_item_data_dir(item, base_directory, subdirectory_name):
+    """
+    Get pytest item data collector directory path.
+
+    The directory is not created here; data collector writers create it on first write, so no directories are
+    left behind for phases which collect nothing.
+
+    Example:
+        item.nodeid = "tests/cluster_upgrade/test_cluster_upgrade.py::test_cluster_upgrade", subdirectory_name = "call"
+        returns "<base_directory>/cluster_upgrade/test_cluster_upgrade/test_cluster_upgrade/call"
+        Items outside testpaths keep their path relative to rootdir, e.g. for
+        "scripts/benchmark/suite/test_benchmark.py::TestBenchmark::test_acm_clusters", subdirectory_name = "call"
+        returns "<base_directory>/scripts/benchmark/suite/test_benchmark/TestBenchmark/test_acm_clusters/call"
+
+    Args:
+        item (pytest.Item): pytest item
+        base_directory (str): data collector base directory
+        subdirectory_name (str): pytest item phase subdirectory name
+
+    Returns:
+        str: pytest item data collector directory path
+    """
+    module_path, *item_names = item.nodeid.split("::")
+    # nodeid paths are relative to rootdir; the tests directory prefix is stripped only for items under it
+    module_dir = os.path.splitext(module_path)[0]
+    for testpath in item.config.getini("testpaths"):
+        testpath = os.path.normpath(testpath)
+        if module_dir.startswith(f"{testpath}{os.sep}"):
+            module_dir = os.path.relpath(module_dir, testpath)
+            break
+    # Parametrized test names may include paths, e.g. kubeconfig file paths
+    item_dirs = [item_name.replace(os.sep, "_") for item_name in item_names]
+
+    return os.path.join(base_directory, module_dir, *item_dirs, subdirectory_name)
+
+
+def get_pod_log_kwargs(data_collector_dict):
+    """
+    Build pod log request arguments which bound the collected log to the failing test.
+
+    Logs are collected since the test setup started (`test_start_time`, set when the SETUP phase starts) and
+    optionally capped by `collect_pod_logs_tail_lines` and `collect_pod_logs_limit_bytes` from the data
+    collector YAML.
+
+    Args:
+        data_collector_dict (dict): data collector configuration
+
+    Returns:
+        dict: read_namespaced_pod_log keyword arguments
+    """
+    log_kwargs = {}
+    test_start_time = data_collector_dict.get("test_start_time")
+    if test_start_time:
+        # The pod log API accepts sinceSeconds only, sinceTime is not exposed by the kubernetes client
+        log_kwargs["since_seconds"] = int(time.time() - test_start_time) + 1
+
+    if data_collector_dict.get("collect_pod_logs_tail_lines"):
+        log_kwargs["tail_lines"] = data_collector_dict["collect_pod_logs_tail_lines"]
+
+    if data_collector_dict.get("collect_pod_logs_limit_bytes"):
+        log_kwargs["limit_bytes"] = data_collector_dict["collect_pod_logs_limit_bytes"]
+
+    return log_kwargs
+
+
+def write_pod_container_log(pod, container_name, file_path, deadline, request_timeout, log_kwargs, content_store):
+    """
+    Stream a pod container log into the content store, gzip-compressed, without holding the whole log in memory.
+
+    Args:
+        pod (Pod): pod resource
+        container_name (str): container name
+        file_path (str): path to the compressed log file
+        deadline (float): time.monotonic() value after which streaming stops, the log is truncated
+        request_timeout (int): timeout in seconds for the log request
+        log_kwargs (dict): additional log request arguments, e.g. since_seconds
+        content_store (ContentStore): collected data store
+    """
+    response = pod.log(
+        container=container_name,
+        _preload_content=False,
+        _request_timeout=request_timeout,
+        **log_kwargs,
+    )
+
+    def _log_chunks():
+        for chunk in response.stream(amt=LOG_CHUNK_SIZE):
+            yield chunk
+            if time.monotonic() > deadline:
+                LOGGER.warning(f"Pod {pod.namespace}/{pod.name} container {container_name} log truncated")
+                return
+
+    try:
+        content_store.write_chunks(file_path=file_path, chunks=_log_chunks(), compress=True)
+    finally:
+        response.release_conn()
+
+
+def collect_pod_data(
+    dyn_client,
+    pod,
+    collector_directory,
+    content_store,
+    collect_pod_logs,
+    pod_timeout,
+    total_deadline,
+    log_kwargs,
+):
+    # Same layout as ocp_wrapper_data_collector collect_pods_data
+    pod_directory = os.path.join(collector_directory, Pod.kind, pod.name)
+    pod_instance = pod.instance
+    content_store.write(
+        file_path=os.path.join(pod_directory, f"{pod.name}.yaml"),
+        content=yaml.dump(pod_instance.to_dict()),
+    )
+
+    if not collect_pod_logs:
+        return
+
+    log_pod = Pod(client=dyn_client, name=pod.name, namespace=pod.namespace)
+    deadline = min(time.monotonic() + pod_timeout, total_deadline)
+    for container in pod_instance.spec.containers:
+        if time.monotonic() > deadline:
+            LOGGER.warning(f"Pod {pod.namespace}/{pod.name} collection timed out")
+            return
+
+        write_pod_container_log(
+            pod=log_pod,
+            container_name=container.name,
+            file_path=os.path.join(pod_directory, "containers", f"{pod.name}_{container.name}.log.gz"),
+            deadline=deadline,
+            request_timeout=pod_timeout,
+            log_kwargs=log_kwargs,
+            content_store=content_store,
+        )
+
+
+def collect_pods_data(dyn_client, pods, collector_directory, content_store, data_collector_dict):
+    """
+    Collect pods YAML and compressed container logs concurrently.
+
+    Collection is bounded by `collect_pods_max_workers`, `collect_pod_timeout` (seconds, per pod) and
+    `collect_pods_total_timeout` (seconds) from the data collector YAML; pods which are not collected within the
+    total timeout are skipped.
+
+    Args:
+        dyn_client (DynamicClient): cluster client
+        pods (list): pods to collect, objects with `name`, `namespace` and `instance` (Pod or CachedResource)
+        collector_directory (str): test data collector directory
+        content_store (ContentStore): collected data store
+        data_collector_dict (dict): data collector configuration
+    """
+    pod_timeout = data_collector_dict.get("collect_pod_timeout", DEFAULT_COLLECT_POD_TIMEOUT)
+    total_timeout = data_collector_dict.get("collect_pods_total_timeout", DEFAULT_COLLECT_PODS_TOTAL_TIMEOUT)
+    total_deadline = time.monotonic() + total_timeout
+    log_kwargs = get_pod_log_kwargs(data_collector_dict=data_collector_dict)
+
+    executor = ThreadPoolExecutor(
+        max_workers=data_collector_dict.get("collect_pods_max_workers", DEFAULT_COLLECT_PODS_MAX_WORKERS),
+        thread_name_prefix="collect-pods",
+    )
+    futures = {
+        executor.submit(
+            collect_pod_data,
+            dyn_client=dyn_client,
+            pod=pod,
+            collector_directory=collector_directory,
+            content_store=content_store,
+            collect_pod_logs=data_collector_dict.get("collect_pod_logs", True),
+            pod_timeout=pod_timeout,
+            total_deadline=total_deadline,
+            log_kwargs=log_kwargs,
+        ): pod
+        for pod in pods
+    }
+    try:
+        done, not_done = wait(fs=futures, timeout=total_timeout)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for future in done:
+        if future.exception():
+            pod = futures[future]
+            LOGGER.warning(f"Failed to collect pod {pod.namespace}/{pod.name} data: {future.exception()}")
+
+    if not_done:
+        LOGGER.warning(f"Pods data collection exceeded {total_timeout} seconds, {len(not_done)} pods not collected")
+
+
+def collect_cached_resources_yaml(cluster_state_cache, resources_to_collect, collector_directory, content_store):
+    """
+    Write resources YAML from the cluster state cache, without listing the resources from the cluster.
+
+    Args:
+        cluster_state_cache (ClusterStateCache): running cluster state cache
+        resources_to_collect (list): ocp_resources resource classes, e.g. [Node]
+        collector_directory (str): test data collector directory
+        content_store (ContentStore): collected data store
+    """
+    for resource in resources_to_collect:
+        for cached_resource in cluster_state_cache.get(resource=resource):
+            content_store.write(
+                file_path=os.path.join(
+                    collector_directory, resource.kind, cached_resource.namespace or "", f"{cached_resource.name}.yaml"
+                ),
+                content=yaml.dump(cached_resource.instance.to_dict()),
+            )
+
+
+def collect_resources_yaml(
+    dyn_client,
+    resources_to_collect,
+    collector_directory,
+    content_store,
+    namespaces=None,
+    label_selector=None,
+):
+    """
+    Write resources YAML, listed page by page; namespaced resources are listed only from `namespaces` if given.
+
+    Args:
+        dyn_client (DynamicClient): cluster client
+        resources_to_collect (list): ocp_resources resource classes, e.g. [Node]
+        collector_directory (str): test data collector directory
+        content_store (ContentStore): collected data store
+        namespaces (list, optional): namespaces to collect namespaced resources from
+        label_selector (str, optional): label selector to filter resources by
+    """
+    for resource in resources_to_collect:
+        is_namespaced = issubclass(resource, NamespacedResource)
+        for namespace in namespaces if namespaces and is_namespaced else [None]:
+            for page in get_resource_pages(
+                dyn_client=dyn_client,
+                resource=resource,
+                namespace=namespace,
+                label_selector=label_selector,
+            ):
+                for item in page.items:
+                    content_store.write(
+                        file_path=os.path.join(
+                            collector_directory,
+                            resource.kind,
+                            item.metadata.namespace or "",
+                            f"{item.metadata.name}.yaml",
+                        ),
+                        content=yaml.dump(item.to_dict()),
+                    )
+
+
+def collect_cluster_data(
+    collector_directory,
+    data_collector_dict,
+    namespaces=None,
+    label_selector=None,
+    resources=None,
+):
+    """
+    Collect cluster resources and pods data on test failure.
+
+    Without a scope (namespaces or label_selector) the whole cluster is collected, read from the cluster state cache
+    when it is running. With a scope, only matching resources are listed from the cluster.
+
+    Collected data is stored once per unique content under the data collector base directory, and referenced from
+    the test collector directory.
+
+    Args:
+        collector_directory (str): test data collector directory
+        data_collector_dict (dict): data collector configuration
+        namespaces (list, optional): namespaces to collect namespaced resources (including pods) from
+        label_selector (str, optional): label selector to filter resources by
+        resources (list, optional): ocp_resources resource classes to collect, default: [Node, Pod]
+    """
+    resources = resources or [Node, Pod]
+    content_store = get_content_store(data_collector_dict=data_collector_dict)
+    resources_to_collect = [resource for resource in resources if resource is not Pod]
+    cluster_state_cache = ClusterStateCache.active
+    use_cluster_state_cache = (
+        cluster_state_cache
+        and not (namespaces or label_selector)
+        and all(resource in cluster_state_cache.resources for resource in resources)
+    )
+    if use_cluster_state_cache:
+        dyn_client = cluster_state_cache.dyn_client
+        collect_cached_resources_yaml(
+            cluster_state_cache=cluster_state_cache,
+            resources_to_collect=resources_to_collect,
+            collector_directory=collector_directory,
+            content_store=content_store,
+        )
+
+    else:
+        dyn_client = get_client()
+        collect_resources_yaml(
+            dyn_client=dyn_client,
+            resources_to_collect=resources_to_collect,
+            collector_directory=collector_directory,
+            content_store=content_store,
+            namespaces=namespaces,
+            label_selector=label_selector,
+        )
+
+    # Pods are listed only when requested, they are usually the largest resource kind in the cluster
+    if Pod in resources:
+        if use_cluster_state_cache:
+            pods = cluster_state_cache.get(resource=Pod)
+        else:
+            pods = [
+                pod
+                for namespace in namespaces or [None]
+                for pod in Pod.get(dyn_client=dyn_client, namespace=namespace, label_selector=label_selector)
+            ]
+
+        collect_pods_data(
+            dyn_client=dyn_client,
+            pods=pods,
+            collector_directory=collector_directory,
+            content_store=content_store,
+            data_collector_dict=data_collector_dict,
+        )
@@ -1,41 +1,238 @@
-from ocm_python_wrapper.ocm_client import OCMPythonClient
-from ocp_utilities.exceptions import (
-    NodeNotReadyError,
-    NodesNotHealthyConditionError,
-    NodeUnschedulableError,
-    PodsFailedOrPendingError,
-)
-from ocp_utilities.infra import (
-    assert_nodes_in_healthy_condition,
-    assert_nodes_schedulable,
-    assert_pods_failed_or_pending,
-)
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from operator import attrgetter
+
 from pytest_testconfig import py_config
 from simple_logger.logger import get_logger
+from timeout_sampler import TimeoutExpiredError
 
 from utilities.pytest_utils import exit_pytest_execution
 
+# ocp_resources and ocp_utilities are imported in the functions which use them, this module is imported by test
+# modules and conftest files on every run
 
 LOGGER = get_logger(name=__name__)
+DEFAULT_PAGE_LIMIT = 500
+# Running and Succeeded pods are filtered by the API server, only candidates for failure are returned
+NOT_RUNNING_PODS_FIELD_SELECTOR = "status.phase!=Running,status.phase!=Succeeded"
+WATCH_TIMEOUT = 5 * 60
+MANAGED_CLUSTER_AVAILABLE_CONDITION = "ManagedClusterConditionAvailable"
+MIN_BACKOFF_SLEEP = 1
+MAX_BACKOFF_SLEEP = 60
+
+
+def get_resource_api(dyn_client, resource):
+    if resource.api_group:
+        return dyn_client.resources.get(kind=resource.kind, group=resource.api_group)
+
+    return dyn_client.resources.get(kind=resource.kind, api_version=resource.api_version)
+
+
+def get_resource_pages(dyn_client, resource, limit=DEFAULT_PAGE_LIMIT, **kwargs):
+    """
+    List resources page by page using the API server limit/continue pagination.
+
+    Args:
+        dyn_client (DynamicClient): cluster client
+        resource (Resource): ocp_resources resource class, e.g. Pod
+        limit (int): maximum number of items in a page
+        kwargs: additional list arguments, e.g. field_selector, label_selector
+
+    Yields:
+        ResourceInstance: list page; page.items holds the page resources as raw ResourceField objects
+    """
+    resource_api = get_resource_api(dyn_client=dyn_client, resource=resource)
+    list_kwargs = {"limit": limit, **kwargs}
+    while True:
+        page = resource_api.get(**list_kwargs)
+        yield page
+
+        continue_token = page.metadata["continue"]
+        if not continue_token:
+            return
+
+        list_kwargs["_continue"] = continue_token
+
+
+class ManagedClusterMetadata:
+    """
+    ACM ManagedCluster name, labels and availability (ManagedClusterConditionAvailable status: "True", "False",
+    "Unknown" or None if not reported), projected from the listed resource.
+    """
+
+    __slots__ = ("name", "labels", "availability")
+
+    def __init__(self, name, labels, availability):
+        self.name = name
+        self.labels = labels
+        self.availability = availability
+
+    def __repr__(self):
+        return f"ManagedClusterMetadata(name={self.name}, availability={self.availability})"
+
+
+def get_managed_clusters_metadata(dyn_client, limit=DEFAULT_PAGE_LIMIT):
+    """
+    List ACM ManagedClusters page by page, keeping only each cluster's metadata; a page is released once projected.
+
+    Args:
+        dyn_client (DynamicClient): ACM hub cluster client
+        limit (int): maximum number of ManagedClusters in a page
+
+    Returns:
+        list: ManagedClusterMetadata, sorted by name
+    """
+    from ocp_resources.managed_cluster import ManagedCluster
+
+    managed_clusters = []
+    for page in get_resource_pages(dyn_client=dyn_client, resource=ManagedCluster, limit=limit):
+        for managed_cluster in page.items:
+            conditions = (managed_cluster.status.conditions if managed_cluster.status else None) or []
+            managed_clusters.append(
+                ManagedClusterMetadata(
+                    name=managed_cluster.metadata.name,
+                    labels=managed_cluster.metadata.labels.to_dict() if managed_cluster.metadata.labels else {},
+                    availability=next(
+                        (
+                            condition.status
+                            for condition in conditions
+                            if condition.type == MANAGED_CLUSTER_AVAILABLE_CONDITION
+                        ),
+                        None,
+                    ),
+                )
+            )
+
+    return sorted(managed_clusters, key=attrgetter("name"))
+
+
+def assert_pods_failed_or_pending_paginated(dyn_client, stop_on_failure=False, request_timeout=None):
+    """
+    Check pods phase page by page, only pods which are not Running or Succeeded are fetched from the cluster.
+
+    Args:
+        dyn_client (DynamicClient): cluster client
+        stop_on_failure (bool): stop listing pods at the first page with failed or pending pods
+        request_timeout (int, optional): timeout in seconds for each list request
+
+    Raises:
+        PodsFailedOrPendingError: if failed or pending pods found
+    """
+    from ocp_resources.pod import Pod
+    from ocp_utilities.exceptions import PodsFailedOrPendingError
+
+    LOGGER.info("Verify pods are not failed or pending.")
+    failed_or_pending_pods = []
+    for page in get_resource_pages(
+        dyn_client=dyn_client,
+        resource=Pod,
+        field_selector=NOT_RUNNING_PODS_FIELD_SELECTOR,
+        _request_timeout=request_timeout,
+    ):
+        failed_or_pending_pods.extend(
+            f"name: {pod.metadata.name}, namespace: {pod.metadata.namespace}, status: {pod.status.phase}\n"
+            for pod in page.items
+            if pod.status.phase in (Pod.Status.PENDING, Pod.Status.FAILED)
+        )
+        if failed_or_pending_pods and stop_on_failure:
+            break
+
+    if failed_or_pending_pods:
+        raise PodsFailedOrPendingError(f"The following pods are failed or pending:\n{''.join(failed_or_pending_pods)}")
+
+
+def wait_for_state(
+    get_func,
+    condition_func,
+    wait_timeout,
+    watch_func=None,
+    min_sleep=MIN_BACKOFF_SLEEP,
+    max_sleep=MAX_BACKOFF_SLEEP,
+):
+    """
+    Wait until condition_func returns True for the observed state.
+
+    If watch_func is given, states are consumed from it as they change; the watch is re-established whenever its
+    window ends. If there is no watch, or the watch drops, get_func is polled with adaptive exponential backoff:
+    the sleep is reset to min_sleep when the state changes and doubled (up to max_sleep) when it does not.
+    Only state changes are logged.
+
+    Args:
+        get_func (callable): returns the current state; states must be comparable with ==
+        condition_func (callable): receives a state, returns True when the wait is over
+        wait_timeout (int): timeout in seconds
+        watch_func (callable, optional): receives `timeout` (seconds) and yields states as they change
+        min_sleep (int): minimal polling interval in seconds
+        max_sleep (int): maximal polling interval in seconds
+
+    Returns:
+        any: the state which satisfied condition_func
+
+    Raises:
+        TimeoutExpiredError: if condition_func is not satisfied within wait_timeout
+    """
+    deadline = time.monotonic() + wait_timeout
+    sleep = min_sleep
+    last_state = None
+
+    def _state_reached(_state):
+        nonlocal last_state
+        if _state != last_state:
+            LOGGER.info(f"State: {_state}")
+            last_state = _state
+
+        return condition_func(_state)
+
+    while (remaining := deadline - time.monotonic()) > 0:
+        if watch_func:
+            try:
+                for state in watch_func(timeout=max(int(min(remaining, WATCH_TIMEOUT)), 1)):
+                    if _state_reached(_state=state):
+                        return state
+
+                continue
+
+            except Exception as ex:
+                LOGGER.warning(f"Watch dropped, falling back to polling: {ex}")
+
+        previous_state = last_state
+        state = get_func()
+        if _state_reached(_state=state):
+            return state
+
+        sleep = min_sleep if state != previous_state else min(sleep * 2, max_sleep)
+        time.sleep(max(min(sleep, deadline - time.monotonic()), 0))
+
+    raise TimeoutExpiredError(f"Timed out after {wait_timeout} seconds waiting for state, last state: {last_state}")
 
 
 def cluster_sanity(
     nodes,
-    pods,
+    admin_client,
     junitxml_property=None,
     exit_pytest=True,
+    request_timeout=None,
 ):
     """
     Args:
         nodes (list): list of Node resources
-        pods (list): list of Pod resources
+        admin_client (DynamicClient): cluster client, used to list pods page by page
         junitxml_property (pytest plugin): record_testsuite_property
-        exit_pytest (bool): Exit pytest execution on failure if True else raise relevant exception
+        exit_pytest (bool): Exit pytest execution on failure if True else raise relevant exception;
+            if True, pods check stops at the first page with failed or pending pods
+        request_timeout (int, optional): timeout in seconds for each pods list request
 
     Raises:
         NodeNotReadyError or NodeUnschedulableError or PodsFailedOrPendingError or
         NodesNotHealthyConditionError: if node check failed
     """
+    from ocp_utilities.exceptions import (
+        NodeNotReadyError,
+        NodesNotHealthyConditionError,
+        NodeUnschedulableError,
+        PodsFailedOrPendingError,
+    )
+    from ocp_utilities.infra import assert_nodes_in_healthy_condition, assert_nodes_schedulable
 
     exceptions_filename = "cluster_sanity_failure.txt"
     try:
@@ -43,7 +240,11 @@ def cluster_sanity(
         LOGGER.info("Check nodes sanity.")
         assert_nodes_schedulable(nodes=nodes)
         assert_nodes_in_healthy_condition(nodes=nodes)
-        assert_pods_failed_or_pending(pods=pods)
+        assert_pods_failed_or_pending_paginated(
+            dyn_client=admin_client,
+            stop_on_failure=exit_pytest,
+            request_timeout=request_timeout,
+        )
 
     except (
         NodeNotReadyError,
@@ -61,13 +262,93 @@ def cluster_sanity(
         raise ex
 
 
+def kubeconfig_cluster_sanity(kubeconfig_file_path, timeout, start_times):
+    """
+    Run cluster sanity against a single cluster using a dedicated client.
+
+    Args:
+        kubeconfig_file_path (str): path to cluster kubeconfig file, default kubeconfig is used if empty
+        timeout (int): timeout in seconds for each API request
+        start_times (dict): kubeconfig file path as key, sanity start time (time.monotonic) as value
+    """
+    from ocp_resources.node import Node
+    from ocp_utilities.infra import get_client
+
+    start_times[kubeconfig_file_path] = time.monotonic()
+    LOGGER.info(f"Running cluster sanity using kubeconfig: {kubeconfig_file_path or 'default'}")
+    admin_client = get_client(config_file=kubeconfig_file_path or None)
+    cluster_sanity(
+        nodes=list(Node.get(dyn_client=admin_client, _request_timeout=timeout)),
+        admin_client=admin_client,
+        exit_pytest=False,
+        request_timeout=timeout,
+    )
+
+
+def multi_clusters_sanity(kubeconfig_file_paths, max_workers, timeout):
+    """
+    Run cluster sanity concurrently against multiple clusters.
+
+    Each cluster is checked in a bounded worker pool with its own client; a cluster which does not complete
+    within `timeout` seconds from the time its check started is reported as failed.
+
+    Args:
+        kubeconfig_file_paths (list): list of kubeconfig file paths
+        max_workers (int): maximum number of clusters to check concurrently
+        timeout (int): cluster sanity timeout in seconds, per cluster
+
+    Returns:
+        dict: kubeconfig file path as key, cluster sanity exception as value (None if cluster sanity passed)
+    """
+    clusters_sanity_results = {}
+    start_times = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cluster-sanity")
+    futures = {
+        executor.submit(
+            kubeconfig_cluster_sanity,
+            kubeconfig_file_path=kubeconfig_file_path,
+            timeout=timeout,
+            start_times=start_times,
+        ): kubeconfig_file_path
+        for kubeconfig_file_path in kubeconfig_file_paths
+    }
+
+    try:
+        pending = set(futures)
+        while pending:
+            done, pending = wait(fs=pending, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                clusters_sanity_results[futures[future]] = future.exception()
+
+            for future in list(pending):
+                kubeconfig_file_path = futures[future]
+                start_time = start_times.get(kubeconfig_file_path)
+                if start_time and time.monotonic() - start_time > timeout:
+                    LOGGER.error(f"Cluster sanity using kubeconfig {kubeconfig_file_path} timed out")
+                    clusters_sanity_results[kubeconfig_file_path] = TimeoutError(
+                        f"Cluster sanity did not complete within {timeout} seconds"
+                    )
+                    pending.remove(future)
+    finally:
+        # Do not block on timed-out clusters; their requests are bounded by the per-request timeout
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return clusters_sanity_results
+
+
 def get_ocm_client(token):
+    from utilities.api_cassette import REPLAY_MODE, ApiCassette, ReplayAccessTokenCache
+    from utilities.ocm_token_cache import CachedTokenOCMPythonClient
+
     api_host = py_config["ocm_api_server"]
     LOGGER.info(f"Running against {api_host}")
-    ocm_client = OCMPythonClient(
+    api_cassette = ApiCassette.active
+    ocm_client = CachedTokenOCMPythonClient(
         token=token.strip(),
-        endpoint="https://sso.redhat.com/auth/realms/redhat-external/protocol/openid-connect/token",
+        endpoint=py_config["ocm_sso_token_endpoint"],
         api_host=api_host,
         discard_unknown_keys=True,
+        # Replayed sessions do not reach SSO
+        token_cache=ReplayAccessTokenCache() if api_cassette and api_cassette.mode == REPLAY_MODE else None,
     )
     return ocm_client.client
@@ -0,0 +1,256 @@
+import contextlib
+import functools
+import json
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from simple_logger.logger import get_logger
+
+
+LOGGER = get_logger(name=__name__)
+KUBERNETES_CLIENT_NAME = "kubernetes"
+OCM_CLIENT_NAME = "ocm"
+
+
+def get_kubernetes_api_resource(url):
+    """
+    Args:
+        url (str): Kubernetes API request URL, e.g. https://<api>/api/v1/namespaces/<namespace>/pods/<name>/log
+
+    Returns:
+        str: requested resource, without namespace and name, e.g. pods/log
+    """
+    segments = [segment for segment in urlparse(url).path.split("/") if segment]
+    if segments[:1] == ["api"]:
+        segments = segments[2:]
+    elif segments[:1] == ["apis"]:
+        segments = segments[3:]
+    else:
+        # Non-resource requests, e.g. /version
+        return "/".join(segments)
+
+    if segments[:1] == ["namespaces"] and len(segments) > 2:
+        segments = segments[2:]
+
+    # <resource>[/<name>[/<subresource>]]
+    return "/".join(segments[:1] + segments[2:3])
+
+
+def get_ocm_api_resource(url):
+    """
+    Args:
+        url (str): OCM API request URL, e.g. https://<api>/api/clusters_mgmt/v1/clusters/<id>/credentials
+
+    Returns:
+        str: requested resource, without object ids, e.g. clusters_mgmt/clusters/credentials
+    """
+    segments = [segment for segment in urlparse(url).path.split("/") if segment]
+    if segments[:1] != ["api"] or len(segments) < 3:
+        return "/".join(segments)
+
+    # api/<service>/<version>/<collection>[/<id>[/<collection>[/<id>]]]
+    return "/".join(segments[1:2] + segments[3::2])
+
+
+def get_response_bytes(response):
+    from urllib3.response import HTTPResponse
+
+    if isinstance(response, HTTPResponse):
+        # Streamed response (watch, logs); reading it here would consume the stream
+        return int(response.headers.get("Content-Length") or 0)
+
+    return len(response.data or b"")
+
+
+def instrument_rest_client(rest_client_class, client_name, get_api_resource):
+    """
+    Record every request made by a generated API client in SessionMetrics.active.
+
+    Args:
+        rest_client_class (type): client RESTClientObject class; all API requests go through its `request` method
+        client_name (str): client name in the report
+        get_api_resource (Callable): returns the requested resource from the request URL
+    """
+    if getattr(rest_client_class.request, "instrumented", False):
+        return
+
+    original_request = rest_client_class.request
+
+    @functools.wraps(original_request)
+    def request(self, method, url, *args, **kwargs):
+        start_time = time.monotonic()
+        response = None
+        status = None
+        try:
+            response = original_request(self, method, url, *args, **kwargs)
+            status = response.status
+            return response
+
+        except Exception as ex:
+            status = getattr(ex, "status", None)
+            raise
+
+        finally:
+            session_metrics = SessionMetrics.active
+            if session_metrics:
+                session_metrics.add_api_call(
+                    client=client_name,
+                    verb=method,
+                    resource=get_api_resource(url),
+                    status=status,
+                    seconds=time.monotonic() - start_time,
+                    response_bytes=get_response_bytes(response=response) if response is not None else 0,
+                )
+
+    request.instrumented = True
+    rest_client_class.request = request
+
+
+class SessionMetrics:
+    """
+    Wall time per test phase and per fixture, and the Kubernetes and OCM API requests made during the session.
+
+    API requests are attributed to the test phase and fixture running when they were made, including requests made
+    from background threads (e.g. ClusterStateCache watches).
+    """
+
+    # Metrics started by pytest_sessionstart; read by pytest hooks and by the instrumented API clients
+    active = None
+
+    def __init__(self):
+        self.phases = defaultdict(dict)
+        self.fixtures = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        self.api_calls = defaultdict(lambda: {"count": 0, "seconds": 0.0, "bytes": 0})
+        self.nodeid = None
+        self.phase = None
+        self.fixture_stack = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Imported only when metrics are enabled
+        from kubernetes.client import rest as kubernetes_rest
+        from ocm_python_client import rest as ocm_rest
+
+        instrument_rest_client(
+            rest_client_class=kubernetes_rest.RESTClientObject,
+            client_name=KUBERNETES_CLIENT_NAME,
+            get_api_resource=get_kubernetes_api_resource,
+        )
+        instrument_rest_client(
+            rest_client_class=ocm_rest.RESTClientObject,
+            client_name=OCM_CLIENT_NAME,
+            get_api_resource=get_ocm_api_resource,
+        )
+        SessionMetrics.active = self
+
+    def stop(self):
+        if SessionMetrics.active is self:
+            SessionMetrics.active = None
+
+    def set_phase(self, nodeid, phase):
+        self.nodeid = nodeid
+        self.phase = phase.lower()
+
+    def add_phase_duration(self, nodeid, phase, seconds):
+        self.phases[nodeid][phase] = seconds
+
+    @contextlib.contextmanager
+    def time_fixture(self, name, scope):
+        self.fixture_stack.append(name)
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            seconds = time.monotonic() - start_time
+            self.fixture_stack.pop()
+            with self._lock:
+                fixture = self.fixtures[(name, scope)]
+                fixture["count"] += 1
+                fixture["seconds"] += seconds
+
+    def add_api_call(self, client, verb, resource, status, seconds, response_bytes):
+        fixture = self.fixture_stack[-1] if self.fixture_stack else None
+        with self._lock:
+            api_call = self.api_calls[(self.nodeid, self.phase, fixture, client, verb, resource, status)]
+            api_call["count"] += 1
+            api_call["seconds"] += seconds
+            api_call["bytes"] += response_bytes
+
+    def get_test_properties(self, nodeid):
+        """
+        Args:
+            nodeid (str): pytest item nodeid
+
+        Returns:
+            list: (name, value) tuples, test phases wall time and API requests totals
+        """
+        properties = [(f"{phase}_seconds", round(seconds, 3)) for phase, seconds in self.phases[nodeid].items()]
+        with self._lock:
+            api_calls = [api_call for key, api_call in self.api_calls.items() if key[0] == nodeid]
+
+        return properties + [
+            ("api_calls", sum(api_call["count"] for api_call in api_calls)),
+            ("api_calls_seconds", round(sum(api_call["seconds"] for api_call in api_calls), 3)),
+            ("api_calls_bytes", sum(api_call["bytes"] for api_call in api_calls)),
+        ]
+
+    def get_session_properties(self):
+        """
+        Returns:
+            list: (name, value) tuples, API requests totals per client
+        """
+        totals = defaultdict(lambda: {"count": 0, "seconds": 0.0, "bytes": 0})
+        with self._lock:
+            for key, api_call in self.api_calls.items():
+                for name, value in api_call.items():
+                    totals[key[3]][name] += value
+
+        properties = []
+        for client, total in totals.items():
+            properties.extend([
+                (f"{client}_api_calls", total["count"]),
+                (f"{client}_api_calls_seconds", round(total["seconds"], 3)),
+                (f"{client}_api_calls_bytes", total["bytes"]),
+            ])
+
+        return properties
+
+    def write_report(self, report_file):
+        """
+        Write the session metrics as JSON; fixtures and API requests are sorted by total time, slowest first.
+
+        Args:
+            report_file (str): report file path
+        """
+        with self._lock:
+            fixtures = [
+                {"fixture": name, "scope": scope, **fixture} for (name, scope), fixture in self.fixtures.items()
+            ]
+            api_calls = [
+                {
+                    "nodeid": nodeid,
+                    "phase": phase,
+                    "fixture": fixture,
+                    "client": client,
+                    "verb": verb,
+                    "resource": resource,
+                    "status": status,
+                    **api_call,
+                }
+                for (nodeid, phase, fixture, client, verb, resource, status), api_call in self.api_calls.items()
+            ]
+
+        with open(report_file, "w") as fd:
+            json.dump(
+                {
+                    "tests": {nodeid: {"phases": phases} for nodeid, phases in self.phases.items()},
+                    "fixtures": sorted(fixtures, key=lambda _fixture: _fixture["seconds"], reverse=True),
+                    "api_calls": sorted(api_calls, key=lambda _api_call: _api_call["seconds"], reverse=True),
+                },
+                fd,
+                indent=2,
+            )
+
+        LOGGER.info(f"Session metrics report written to {report_file}")
@@ -0,0 +1,89 @@
+"""
+Read a single test's log from the pytest log file, using the index written by IndexedRotatingFileHandler.
+
+Usage:
+    python -m utilities.log_index pytest-tests.log "tests/cluster_sanity/test_cluster_sanity.py::test_cluster_sanity"
+    python -m utilities.log_index pytest-tests.log "<nodeid>" --phase CALL
+"""
+
+import argparse
+import json
+import sys
+
+from utilities.logger import LOG_INDEX_FILE_SUFFIX
+
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def get_log_segments(log_file, nodeid, phase=None):
+    """
+    Args:
+        log_file (str): pytest log file path
+        nodeid (str): pytest item nodeid
+        phase (str, optional): test phase (SETUP, CALL or TEARDOWN), all phases if not given
+
+    Returns:
+        tuple: list of matching index segments, current log rollover generation
+    """
+    segments = []
+    generation = 0
+    with open(f"{log_file}{LOG_INDEX_FILE_SUFFIX}") as fd:
+        for line in fd:
+            entry = json.loads(line)
+            if "generation" in entry:
+                generation = entry["generation"]
+            elif entry["nodeid"] == nodeid and (phase is None or entry["phase"] == phase):
+                segments.append(entry)
+
+    return segments, generation
+
+
+def read_log_segment(log_file, segment, generation):
+    """
+    Read a log segment, which may span rotated log files; only the segment bytes are read.
+
+    Args:
+        log_file (str): pytest log file path
+        segment (dict): index segment
+        generation (int): current log rollover generation
+
+    Yields:
+        bytes: log segment chunks
+    """
+    for segment_generation in range(segment["start_generation"], segment["end_generation"] + 1):
+        backup_number = generation - segment_generation
+        with open(f"{log_file}.{backup_number}" if backup_number else log_file, "rb") as fd:
+            if segment_generation == segment["start_generation"]:
+                fd.seek(segment["start_offset"])
+
+            remaining = segment["end_offset"] - fd.tell() if segment_generation == segment["end_generation"] else None
+            while remaining is None or remaining > 0:
+                chunk = fd.read(READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+
+                if remaining is not None:
+                    remaining -= len(chunk)
+
+                yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a test's log from the pytest log file")
+    parser.add_argument("log_file", help="Path to pytest log file")
+    parser.add_argument("nodeid", help="pytest test nodeid")
+    parser.add_argument("--phase", choices=["SETUP", "CALL", "TEARDOWN"], help="Print only the given test phase")
+    args = parser.parse_args()
+
+    segments, generation = get_log_segments(log_file=args.log_file, nodeid=args.nodeid, phase=args.phase)
+    if not segments:
+        sys.exit(f"No log found for {args.nodeid}")
+
+    for segment in segments:
+        for chunk in read_log_segment(log_file=args.log_file, segment=segment, generation=generation):
+            sys.stdout.buffer.write(chunk)
+
+
+if __name__ == "__main__":
+    main()
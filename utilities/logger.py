@@ -1,30 +1,132 @@
+import json
 import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
 from colorlog import ColoredFormatter
 
 
 LOGGER = logging.getLogger(__name__)
+# Log record attribute (set with `extra`) which marks the start of a test phase log segment
+LOG_SEGMENT_ATTRIBUTE = "log_segment"
+LOG_INDEX_FILE_SUFFIX = ".index.jsonl"
+LOG_FILE_MAX_BYTES = 100 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 20
 
 
-class DuplicateFilter(logging.Filter):
+class RateLimitFilter(logging.Filter):
+    """
+    Rate-limit log records per call site (logger name, file and line), so repeated messages are limited even when
+    their text changes (e.g. f-strings logged from a polling loop).
+
+    Each call site has a token bucket of `burst` records, refilled at `rate` records per second; records below
+    WARNING level are dropped when the bucket is empty. Every `summary_interval` seconds, the number of suppressed
+    records per call site is logged. Up to `max_call_sites` call sites are tracked, least recently used are evicted.
+
+    When `loggers` is set, only records of these loggers (and their children) are rate-limited. `reset` refills all
+    buckets, e.g. at the start of each test phase, so a noisy phase does not silence the following ones.
+    """
+
+    def __init__(self, rate=0.2, burst=10, summary_interval=60, max_call_sites=1024, loggers=None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.loggers = tuple(loggers or ())
+        self.summary_interval = summary_interval
+        self.max_call_sites = max_call_sites
+        # call site: [tokens, last update time, suppressed records]
+        self.call_sites = OrderedDict()
+        self.evicted_suppressed = {}
+        self.last_summary_time = time.monotonic()
+        self.lock = threading.Lock()
+
     def filter(self, record):
-        repeated_number_exists = getattr(self, "repeated_number", None)
-        current_log = (record.module, record.levelno, record.msg)
-        if current_log != getattr(self, "last_log", None):
-            self.last_log = current_log
-            if repeated_number_exists:
-                LOGGER.warning(f"Last log repeated {self.repeated_number} times.")
-
-            self.repeated_number = 0
+        if record.levelno >= logging.WARNING or not self.is_limited_logger(logger_name=record.name):
             return True
-        if repeated_number_exists:
-            self.repeated_number += 1
-        else:
-            self.repeated_number = 1
-        return False
+
+        now = time.monotonic()
+        call_site_key = (record.name, record.pathname, record.lineno)
+        with self.lock:
+            call_site = self.call_sites.get(call_site_key)
+            if call_site:
+                self.call_sites.move_to_end(call_site_key)
+                call_site[0] = min(self.burst, call_site[0] + (now - call_site[1]) * self.rate)
+                call_site[1] = now
+            else:
+                call_site = self.call_sites[call_site_key] = [self.burst, now, 0]
+                if len(self.call_sites) > self.max_call_sites:
+                    evicted_key, evicted_call_site = self.call_sites.popitem(last=False)
+                    if evicted_call_site[2]:
+                        self.evicted_suppressed[evicted_key] = evicted_call_site[2]
+
+            allowed = call_site[0] >= 1
+            if allowed:
+                call_site[0] -= 1
+            else:
+                call_site[2] += 1
+
+            summaries = self.pop_summaries() if now - self.last_summary_time >= self.summary_interval else {}
+
+        # Logged outside the lock, summary records go through this filter as well
+        self.log_summaries(summaries=summaries)
+        return allowed
+
+    def is_limited_logger(self, logger_name):
+        if not self.loggers:
+            return True
+
+        return any(logger_name == name or logger_name.startswith(f"{name}.") for name in self.loggers)
+
+    def pop_summaries(self):
+        summaries = self.evicted_suppressed
+        self.evicted_suppressed = {}
+        for call_site_key, call_site in self.call_sites.items():
+            if call_site[2]:
+                summaries[call_site_key] = call_site[2]
+                call_site[2] = 0
+
+        self.last_summary_time = time.monotonic()
+        return summaries
+
+    def flush_summaries(self):
+        with self.lock:
+            summaries = self.pop_summaries()
+
+        self.log_summaries(summaries=summaries)
+
+    def reset(self):
+        with self.lock:
+            summaries = self.pop_summaries()
+            self.call_sites.clear()
+
+        self.log_summaries(summaries=summaries)
+
+    @staticmethod
+    def log_summaries(summaries):
+        for (logger_name, pathname, lineno), suppressed in summaries.items():
+            LOGGER.warning(f"{suppressed} log records suppressed from {logger_name} ({pathname}:{lineno})")
+
+
+class TestContextFilter(logging.Filter):
+    """
+    Add the running test nodeid and phase to log records, taken from the last test phase segment marker record.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.segment = {}
+
+    def filter(self, record):
+        self.segment = getattr(record, LOG_SEGMENT_ATTRIBUTE, None) or self.segment
+        record.nodeid = self.segment.get("nodeid")
+        record.phase = self.segment.get("phase")
+        return True
 
 
 class TestLogFormatter(ColoredFormatter):
@@ -32,7 +134,199 @@ class TestLogFormatter(ColoredFormatter):
         return datetime.fromtimestamp(record.created).isoformat()
 
 
-def setup_logging(log_level, log_file="/tmp/pytest-tests.log"):
+class JsonLogFormatter(logging.Formatter):
+    """
+    Format a record as a single-line JSON object.
+    """
+
+    def format(self, record):
+        log_entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "nodeid": getattr(record, "nodeid", None),
+            "phase": getattr(record, "phase", None),
+        }
+        if record.exc_info:
+            log_entry["exception"] = self.formatException(ei=record.exc_info)
+
+        return json.dumps(log_entry, separators=(",", ":"))
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue records as they are; messages are formatted by the listener handlers which write them.
+    Records are not passed to other processes, so they do not need to be formatted and stripped for pickling.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class LoggerNameFormatter(logging.Formatter):
+    """
+    Format records using the formatter set for the record's logger name, so a single handler can write records of
+    loggers with different formats.
+    """
+
+    def __init__(self, formatters, default_formatter):
+        super().__init__()
+        self.formatters = formatters
+        self.default_formatter = default_formatter
+
+    def format(self, record):
+        return self.formatters.get(record.name, self.default_formatter).format(record)
+
+
+class BatchFlushMixin:
+    """
+    Do not flush the stream on every record; BatchQueueListener flushes once the queue is drained.
+    Once `batch` is False (records are written directly, without a listener), flush on every record.
+    """
+
+    batch = True
+
+    def flush(self):
+        if not self.batch:
+            super().flush()
+
+    def flush_batch(self):
+        super().flush()
+
+
+class BatchStreamHandler(BatchFlushMixin, logging.StreamHandler):
+    pass
+
+
+class BatchRotatingFileHandler(BatchFlushMixin, RotatingFileHandler):
+    pass
+
+
+class IndexedRotatingFileHandler(BatchRotatingFileHandler):
+    """
+    Rotating file handler which indexes the log file position of each test phase.
+
+    A record with a `log_segment` attribute ({"nodeid": <nodeid>, "phase": <phase>}) starts a new segment and ends
+    the previous one. Each ended segment is written to `<log file>.index.jsonl` as start and end positions, where a
+    position is a rollover generation and a byte offset; the index also records the current generation on every
+    rollover, so positions can be mapped to the rotated backup files (see utilities.log_index).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.generation = 0
+        self.segment = None
+        self.segment_start = None
+        self.index_file = open(f"{self.baseFilename}{LOG_INDEX_FILE_SUFFIX}", "w")
+        self.write_index(entry={"generation": self.generation})
+
+    def position(self):
+        return self.generation, self.stream.tell()
+
+    def write_index(self, entry):
+        self.index_file.write(json.dumps(entry) + "\n")
+
+    def end_segment(self):
+        if self.segment:
+            start_generation, start_offset = self.segment_start
+            end_generation, end_offset = self.position()
+            self.write_index(
+                entry={
+                    **self.segment,
+                    "start_generation": start_generation,
+                    "start_offset": start_offset,
+                    "end_generation": end_generation,
+                    "end_offset": end_offset,
+                }
+            )
+            self.segment = None
+
+    def doRollover(self):  # noqa: N802
+        super().doRollover()
+        self.generation += 1
+        self.write_index(entry={"generation": self.generation})
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+
+            segment = getattr(record, LOG_SEGMENT_ATTRIBUTE, None)
+            if segment and segment != self.segment:
+                self.end_segment()
+                self.segment = segment
+                self.segment_start = self.position()
+
+            logging.FileHandler.emit(self, record)
+
+        except Exception:
+            self.handleError(record)
+
+    def flush_batch(self):
+        super().flush_batch()
+        self.index_file.flush()
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.stream:
+                self.end_segment()
+
+            self.index_file.close()
+        finally:
+            self.release()
+
+        super().close()
+
+
+class BatchQueueListener(QueueListener):
+    """
+    Write queued records from a background thread, flushing handlers only when there are no pending records.
+    """
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            self.flush_handlers()
+
+    def flush_handlers(self):
+        for handler in self.handlers:
+            handler.flush_batch()
+
+    def stop(self):
+        super().stop()
+        self.flush_handlers()
+
+
+def remove_log_files(log_file):
+    """
+    Remove a previous run's log file, its rotated backups and its index, so they do not mix with the new run's logs.
+
+    Args:
+        log_file (str): log file path
+    """
+    for file_path in (
+        log_file,
+        f"{log_file}{LOG_INDEX_FILE_SUFFIX}",
+        *(f"{log_file}.{backup_number}" for backup_number in range(1, LOG_FILE_BACKUP_COUNT + 1)),
+    ):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def setup_logging(log_level, log_file="/tmp/pytest-tests.log", log_format="text", rate_limit_filter=None):
+    """
+    Log records are put on a queue by the logging thread and written by a single background listener, with one
+    handler per sink (log file and console).
+
+    Args:
+        log_level (int): log level
+        log_file (str): log file path
+        log_format (str): log file format, "text" or "json" (one JSON object per record, with test nodeid and phase)
+        rate_limit_filter (RateLimitFilter, optional): filter to rate-limit records with; records are not rate-limited
+            if not passed
+    """
     log_file_path = Path(log_file)
     log_file_path_parent = log_file_path.parent
     if not log_file_path_parent.exists():
@@ -54,26 +348,89 @@ def setup_logging(log_level, log_file="/tmp/pytest-tests.log"):
         secondary_log_colors={},
     )
 
-    console_handler = logging.StreamHandler()
-    log_handler = RotatingFileHandler(filename=log_file, maxBytes=100 * 1024 * 1024, backupCount=20)
-    basic_console_handler = logging.StreamHandler()
-    basic_log_handler = RotatingFileHandler(filename=log_file, maxBytes=100 * 1024 * 1024, backupCount=20)
+    console_handler = BatchStreamHandler()
+    log_handler = IndexedRotatingFileHandler(
+        filename=log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUP_COUNT
+    )
+
+    # Records of the basic logger are written as-is
+    sink_formatter = LoggerNameFormatter(
+        formatters={basic_logger.name: root_log_formatter},
+        default_formatter=log_formatter,
+    )
+    log_handler.setFormatter(fmt=JsonLogFormatter() if log_format == "json" else sink_formatter)
+    console_handler.setFormatter(fmt=sink_formatter)
+
+    log_queue = queue.SimpleQueue()
+    log_listener = BatchQueueListener(log_queue, console_handler, log_handler, respect_handler_level=True)
 
-    basic_log_handler.setFormatter(fmt=root_log_formatter)
-    basic_console_handler.setFormatter(fmt=root_log_formatter)
-    basic_logger.addHandler(hdlr=basic_log_handler)
-    basic_logger.addHandler(hdlr=basic_console_handler)
+    test_context_filter = TestContextFilter()
+    basic_queue_handler = DeferredQueueHandler(queue=log_queue)
+    basic_queue_handler.addFilter(filter=test_context_filter)
+    basic_logger.addHandler(hdlr=basic_queue_handler)
     basic_logger.setLevel(level=log_level)
 
-    log_handler.setFormatter(fmt=log_formatter)
-    console_handler.setFormatter(fmt=log_formatter)
+    # Filtered before records are queued, so suppressed records are never formatted or written
+    queue_handler = DeferredQueueHandler(queue=log_queue)
+    if rate_limit_filter:
+        queue_handler.addFilter(filter=rate_limit_filter)
 
-    logger_obj.addHandler(hdlr=console_handler)
-    logger_obj.addHandler(hdlr=log_handler)
+    queue_handler.addFilter(filter=test_context_filter)
+    queue_handler.listener = log_listener
+    logger_obj.addHandler(hdlr=queue_handler)
     logger_obj.setLevel(level=log_level)
 
-    logger_obj.addFilter(filter=DuplicateFilter())
-    console_handler.addFilter(filter=DuplicateFilter())
-
     logger_obj.propagate = False
     basic_logger.propagate = False
+
+    log_listener.start()
+
+
+def get_rate_limit_filters():
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, QueueHandler):
+            for _filter in handler.filters:
+                if isinstance(_filter, RateLimitFilter):
+                    yield _filter
+
+
+def reset_rate_limit():
+    """
+    Refill the rate limit buckets of all call sites, logging the records suppressed so far.
+    """
+    for rate_limit_filter in get_rate_limit_filters():
+        rate_limit_filter.reset()
+
+
+def stop_logging():
+    """
+    Write all queued log records and stop the logging listener thread.
+
+    The queue handlers are replaced by the listener handlers, so records logged afterwards (e.g. by threads still
+    running after the session) are written directly instead of being queued with no listener; the log sinks are
+    closed by logging.shutdown at exit.
+    """
+    for rate_limit_filter in get_rate_limit_filters():
+        rate_limit_filter.flush_summaries()
+
+    logger_obj = logging.getLogger()
+    log_listener = next(
+        (handler.listener for handler in logger_obj.handlers if getattr(handler, "listener", None)),
+        None,
+    )
+    if not log_listener:
+        return
+
+    for listener_handler in log_listener.handlers:
+        listener_handler.batch = False
+
+    for _logger in (logger_obj, logging.getLogger("basic")):
+        for handler in list(_logger.handlers):
+            if isinstance(handler, QueueHandler):
+                _logger.removeHandler(hdlr=handler)
+                handler.listener = None
+
+        for listener_handler in log_listener.handlers:
+            _logger.addHandler(hdlr=listener_handler)
+
+    log_listener.stop()
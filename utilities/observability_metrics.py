@@ -0,0 +1,372 @@
+import codecs
+import json
+import re
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from simple_logger.logger import get_logger
+from timeout_sampler import TimeoutSampler
+
+
+LOGGER = get_logger(name=__name__)
+CLUSTER_LABEL = "cluster"
+# Label added to each batched query's samples, naming the query they belong to
+BATCH_QUERY_LABEL = "batch_query"
+# Merged queries are sent as URL query parameters; longer batches are split
+MAX_BATCH_QUERY_LENGTH = 6000
+QUERY_REQUEST_TIMEOUT = 60
+QUERY_RETRY_TIMEOUT = 2 * 60
+QUERY_RETRY_INTERVAL = 10
+RESPONSE_CHUNK_SIZE = 64 * 1024
+RESULT_START_REGEX = re.compile(r'"result"\s*:\s*\[')
+RESULT_SEPARATOR_REGEX = re.compile(r"[\s,]*")
+
+
+class PrometheusQueryError(Exception):
+    pass
+
+
+class ClustersMetricSamples:
+    """
+    Prometheus query samples of a fleet of clusters, stored as columns: cluster index, timestamp and value.
+
+    Cluster names are stored once, sorted, in `clusters`; each sample refers to its cluster by index.
+    """
+
+    def __init__(self, clusters, cluster_indexes, timestamps, values):
+        self.clusters = clusters
+        self.cluster_indexes = cluster_indexes
+        self.timestamps = timestamps
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    @classmethod
+    def from_query_result(cls, query_result, cluster_label=CLUSTER_LABEL):
+        """
+        Args:
+            query_result (Iterable): Prometheus instant or range query result,
+                e.g. [{"metric": {...}, "value": [<ts>, "<value>"]}]
+            cluster_label (str): name of the label which holds the cluster name
+
+        Returns:
+            ClustersMetricSamples: query samples
+        """
+        columns = ClustersMetricColumns(cluster_label=cluster_label)
+        for sample in query_result:
+            columns.add(sample=sample)
+
+        return columns.get_samples()
+
+    def get_latest_values(self):
+        """
+        Returns:
+            numpy.ndarray: value of each cluster's latest sample, in `clusters` order
+        """
+        if not len(self):
+            return self.values
+
+        order = np.lexsort((self.timestamps, self.cluster_indexes))
+        sorted_cluster_indexes = self.cluster_indexes[order]
+        # Last sample of each cluster, where the next sample belongs to the next cluster
+        last_samples = np.flatnonzero(np.append(sorted_cluster_indexes[1:] != sorted_cluster_indexes[:-1], True))
+        return self.values[order][last_samples]
+
+    def get_invalid_clusters(self):
+        """
+        Returns:
+            dict: cluster name to latest value, for clusters whose latest value is not a positive number
+        """
+        latest_values = self.get_latest_values()
+        invalid = ~(np.isfinite(latest_values) & (latest_values > 0))
+        return dict(zip(self.clusters[invalid].tolist(), latest_values[invalid].tolist()))
+
+
+class ClustersMetricColumns:
+    """
+    Compact columns which query samples are appended to as they are parsed, turned into ClustersMetricSamples.
+    """
+
+    def __init__(self, cluster_label=CLUSTER_LABEL):
+        self.cluster_label = cluster_label
+        self.cluster_names = []
+        self.timestamps = array("d")
+        self.values = array("d")
+
+    def add(self, sample):
+        """
+        Args:
+            sample (dict): instant query sample ({"metric": {...}, "value": [<ts>, "<value>"]}) or range query
+                series ({"metric": {...}, "values": [[<ts>, "<value>"], ...]})
+        """
+        points = sample["values"] if "values" in sample else [sample["value"]]
+        self.cluster_names.extend([sample["metric"][self.cluster_label]] * len(points))
+        for timestamp, value in points:
+            self.timestamps.append(float(timestamp))
+            # Prometheus sample values are strings, e.g. "1.5", "NaN", "+Inf"
+            self.values.append(float(value))
+
+    def get_samples(self):
+        clusters, cluster_indexes = np.unique(np.array(self.cluster_names, dtype=str), return_inverse=True)
+        return ClustersMetricSamples(
+            clusters=clusters,
+            cluster_indexes=cluster_indexes,
+            timestamps=np.frombuffer(self.timestamps, dtype=np.float64),
+            values=np.frombuffer(self.values, dtype=np.float64),
+        )
+
+
+def iter_query_result(chunks):
+    """
+    Parse a Prometheus query response incrementally, yielding the result samples one by one as they arrive,
+    so the whole response is never held in memory.
+
+    Args:
+        chunks (Iterable): response body text chunks
+
+    Yields:
+        dict: result sample, e.g. {"metric": {...}, "value": [<ts>, "<value>"]}, or range query series
+
+    Raises:
+        PrometheusQueryError: if the response has no result
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    in_result = False
+    for chunk in chunks:
+        buffer += chunk
+        if not in_result:
+            match = RESULT_START_REGEX.search(buffer)
+            if not match:
+                continue
+
+            buffer = buffer[match.end() :]
+            in_result = True
+
+        position = 0
+        while True:
+            position = RESULT_SEPARATOR_REGEX.match(buffer, position).end()
+            if buffer.startswith("]", position):
+                return
+
+            try:
+                sample, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Incomplete sample, parsed once the next chunk arrives
+                break
+
+            yield sample
+
+        buffer = buffer[position:]
+
+    raise PrometheusQueryError(f"Incomplete or unexpected query response: {buffer[:1000]}")
+
+
+def get_batch_queries(queries, max_length=MAX_BATCH_QUERY_LENGTH):
+    """
+    Merge instant vector queries into as few PromQL expressions as possible. Each query's samples are labeled
+    with the query name, and queries are joined with `or`: the label makes their series distinct, so all are kept.
+
+    Args:
+        queries (dict): query name to PromQL instant vector query
+        max_length (int): maximum merged expression length
+
+    Returns:
+        list: tuples of merged expression and the queries (dict) it holds
+    """
+    batches = []
+    expressions, batch_queries, length = [], {}, 0
+    for name, query in queries.items():
+        expression = f'label_replace(({query}), "{BATCH_QUERY_LABEL}", "{name}", "", "")'
+        if expressions and length + len(expression) > max_length:
+            batches.append((" or ".join(expressions), batch_queries))
+            expressions, batch_queries, length = [], {}, 0
+
+        expressions.append(expression)
+        batch_queries[name] = query
+        length += len(expression) + len(" or ")
+
+    if expressions:
+        batches.append((" or ".join(expressions), batch_queries))
+
+    return batches
+
+
+class PrometheusQueryClient:
+    """
+    Runs PromQL instant queries through a Prometheus API, e.g. ACM rbac-query-proxy, concurrently over one pooled
+    session. Queries are merged into as few requests as possible and responses are parsed as they arrive.
+
+    Args:
+        prometheus (Prometheus): ocp_utilities Prometheus, for the API URL, headers and SSL verification
+        max_workers (int): maximum number of concurrent requests
+        cluster_label (str): name of the label which holds the cluster name
+    """
+
+    def __init__(self, prometheus, max_workers=10, cluster_label=CLUSTER_LABEL):
+        self.api_url = f"{prometheus.api_url}{prometheus.api_v1}"
+        self.max_workers = max_workers
+        self.cluster_label = cluster_label
+        self.session = requests.Session()
+        self.session.headers.update(prometheus.headers)
+        self.session.verify = prometheus.verify_ssl
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def query(self, queries, timeout=QUERY_RETRY_TIMEOUT):
+        """
+        Run instant vector queries, merged into as few requests as possible, concurrently.
+        A merged request which fails (e.g. one of its queries is not an instant vector query) is retried as one
+        request per query.
+
+        Args:
+            queries (dict): query name to PromQL instant vector query
+            timeout (int): seconds to retry failing queries for
+
+        Returns:
+            dict: query name to ClustersMetricSamples
+
+        Raises:
+            TimeoutExpiredError: if a query still fails after `timeout`
+        """
+        return self._run_queries(queries=queries, path="query", params={}, timeout=timeout)
+
+    def query_range(self, queries, start, end, step, timeout=QUERY_RETRY_TIMEOUT):
+        """
+        Run range queries, merged and run like `query`; each query's samples hold all the samples in the range.
+
+        Args:
+            queries (dict): query name to PromQL instant vector query
+            start (float): range start, epoch seconds
+            end (float): range end, epoch seconds
+            step (int): seconds between evaluations in the range
+            timeout (int): seconds to retry failing queries for
+
+        Returns:
+            dict: query name to ClustersMetricSamples
+
+        Raises:
+            TimeoutExpiredError: if a query still fails after `timeout`
+        """
+        return self._run_queries(
+            queries=queries, path="query_range", params={"start": start, "end": end, "step": step}, timeout=timeout
+        )
+
+    def _run_queries(self, queries, path, params, timeout):
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prometheus-query") as executor:
+            for batch_results in executor.map(
+                lambda batch: self._query_batch(
+                    expression=batch[0], queries=batch[1], path=path, params=params, timeout=timeout
+                ),
+                get_batch_queries(queries=queries),
+            ):
+                results.update(batch_results)
+
+        return results
+
+    def _query_batch(self, expression, queries, path, params, timeout):
+        if len(queries) == 1:
+            return self._query_with_retries(
+                expression=expression, names=list(queries), path=path, params=params, timeout=timeout
+            )
+
+        try:
+            return self._get_batch_samples(expression=expression, names=list(queries), path=path, params=params)
+        except PrometheusQueryError as ex:
+            LOGGER.warning(f"Merged query of {list(queries)} failed, running them separately: {ex}")
+            results = {}
+            for name, query in queries.items():
+                [(query_expression, _)] = get_batch_queries(queries={name: query})
+                results.update(
+                    self._query_with_retries(
+                        expression=query_expression, names=[name], path=path, params=params, timeout=timeout
+                    )
+                )
+
+            return results
+
+    def _query_with_retries(self, expression, names, path, params, timeout):
+        for sample in TimeoutSampler(
+            wait_timeout=timeout,
+            sleep=QUERY_RETRY_INTERVAL,
+            func=self._get_batch_samples,
+            exceptions_dict={PrometheusQueryError: [], requests.RequestException: []},
+            expression=expression,
+            names=names,
+            path=path,
+            params=params,
+        ):
+            if sample:
+                return sample
+
+    def _get_batch_samples(self, expression, names, path, params):
+        columns = {name: ClustersMetricColumns(cluster_label=self.cluster_label) for name in names}
+        with self.session.get(
+            f"{self.api_url}/{path}", params={"query": expression, **params}, stream=True, timeout=QUERY_REQUEST_TIMEOUT
+        ) as response:
+            if response.status_code != 200:
+                raise PrometheusQueryError(f"Query failed with status {response.status_code}: {response.text[:1000]}")
+
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            for sample in iter_query_result(
+                chunks=(decoder.decode(chunk) for chunk in response.iter_content(chunk_size=RESPONSE_CHUNK_SIZE))
+            ):
+                columns[sample["metric"].pop(BATCH_QUERY_LABEL)].add(sample=sample)
+
+        return {name: name_columns.get_samples() for name, name_columns in columns.items()}
+
+
+def get_stale_clusters(sample_timestamps, window_end, max_age, max_gap):
+    """
+    Find clusters whose metric is reported late: the latest sample is too old, or samples have too large gaps.
+
+    Args:
+        sample_timestamps (ClustersMetricSamples): `timestamp(<metric>)` range query samples, whose values are the
+            metric samples timestamps; a sample seen at several range steps repeats the same timestamp
+        window_end (float): range query end, epoch seconds
+        max_age (float): maximum seconds since a cluster's latest sample
+        max_gap (float): maximum seconds between consecutive samples of a cluster
+
+    Returns:
+        dict: cluster name to {"age": <seconds>, "max_gap": <seconds>}, for stale clusters
+    """
+    if not len(sample_timestamps):
+        return {}
+
+    order = np.lexsort((sample_timestamps.values, sample_timestamps.cluster_indexes))
+    cluster_indexes = sample_timestamps.cluster_indexes[order]
+    timestamps = sample_timestamps.values[order]
+    cluster_starts = np.flatnonzero(np.append(True, cluster_indexes[1:] != cluster_indexes[:-1]))
+    # Gap to the previous sample of the same cluster
+    gaps = np.append(0, np.diff(timestamps))
+    gaps[cluster_starts] = 0
+    max_gaps = np.maximum.reduceat(gaps, cluster_starts)
+    ages = window_end - np.maximum.reduceat(timestamps, cluster_starts)
+    stale = (ages > max_age) | (max_gaps > max_gap)
+    return {
+        cluster: {"age": age, "max_gap": cluster_max_gap}
+        for cluster, age, cluster_max_gap in zip(
+            sample_timestamps.clusters[stale].tolist(), ages[stale].tolist(), max_gaps[stale].tolist()
+        )
+    }
+
+
+def get_missing_clusters(expected_clusters, reported_clusters):
+    """
+    Args:
+        expected_clusters (list): cluster names
+        reported_clusters (numpy.ndarray): cluster names, e.g. ClustersMetricSamples clusters
+
+    Returns:
+        list: sorted names of expected clusters which are not reported
+    """
+    return np.setdiff1d(np.array(expected_clusters, dtype=str), reported_clusters).tolist()
@@ -0,0 +1,171 @@
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import requests
+from ocm_python_client.api_client import ApiClient
+from ocm_python_client.configuration import Configuration
+from ocm_python_client.exceptions import UnauthorizedException
+from ocm_python_wrapper.exceptions import AuthenticationError, EndpointAccessError
+from ocm_python_wrapper.ocm_client import OCMPythonClient
+from simple_logger.logger import get_logger
+
+from utilities.cache_directory import ensure_private_cache_directory
+
+
+LOGGER = get_logger(name=__name__)
+OCM_TOKEN_CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), f"ocm-token-cache-{os.getuid()}")
+# Access tokens are refreshed when they expire within this many seconds
+TOKEN_REFRESH_AHEAD = 60
+SSO_REQUEST_TIMEOUT = 30
+
+# Keep-alive connections to SSO, shared by all token caches in the process
+SSO_SESSION = requests.Session()
+
+
+class OCMAccessTokenCache:
+    """
+    OCM access token, exchanged once for all sessions that use the same offline token and api_host.
+
+    The token is kept in memory and in a cache file, shared by parallel sessions on the same host. The cache file is
+    locked while it is refreshed, so only one session exchanges the offline token with SSO. If the cache directory
+    is not private to the current user, the token is kept in memory only.
+    """
+
+    def __init__(self, offline_token, endpoint, api_host, cache_directory=OCM_TOKEN_CACHE_DIRECTORY):
+        self.offline_token = offline_token
+        self.endpoint = endpoint
+        self.cache_directory = cache_directory
+        cache_key = hashlib.sha256(f"{api_host}\0{offline_token}".encode()).hexdigest()
+        self.cache_file = os.path.join(cache_directory, f"{cache_key}.json")
+        self._access_token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def get_access_token(self, rejected_token=None):
+        """
+        Args:
+            rejected_token (str, optional): access token rejected by the API; it is refreshed even if not expired
+
+        Returns:
+            str: OCM access token, valid for at least TOKEN_REFRESH_AHEAD seconds
+        """
+        with self._lock:
+            if self._is_valid(
+                access_token=self._access_token, expires_at=self._expires_at, rejected_token=rejected_token
+            ):
+                return self._access_token
+
+            if ensure_private_cache_directory(directory=self.cache_directory):
+                cached_token = self._get_shared_access_token(rejected_token=rejected_token)
+            else:
+                cached_token = self._exchange_offline_token()
+
+            self._access_token = cached_token["access_token"]
+            self._expires_at = cached_token["expires_at"]
+            return self._access_token
+
+    def _get_shared_access_token(self, rejected_token):
+        with open(f"{self.cache_file}.lock", "a") as lock_fd:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                cached_token = self._read_cache_file()
+                if not self._is_valid(rejected_token=rejected_token, **cached_token):
+                    cached_token = self._exchange_offline_token()
+                    self._write_cache_file(cached_token=cached_token)
+
+                return cached_token
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _is_valid(access_token, expires_at, rejected_token=None):
+        return bool(access_token) and access_token != rejected_token and expires_at - TOKEN_REFRESH_AHEAD > time.time()
+
+    def _read_cache_file(self):
+        try:
+            with open(self.cache_file) as fd:
+                return json.load(fd)
+        except (OSError, ValueError):
+            return {"access_token": None, "expires_at": 0}
+
+    def _write_cache_file(self, cached_token):
+        # Written to a temporary file and renamed, readers never see a partial file
+        fd, tmp_file = tempfile.mkstemp(dir=self.cache_directory)
+        with os.fdopen(fd, "w") as tmp_fd:
+            json.dump(cached_token, tmp_fd)
+
+        os.replace(tmp_file, self.cache_file)
+
+    def _exchange_offline_token(self):
+        LOGGER.info(f"Exchanging OCM offline token for an access token with {self.endpoint}")
+        request_time = time.time()
+        response = SSO_SESSION.post(
+            self.endpoint,
+            data={
+                "grant_type": "refresh_token",
+                "client_id": "cloud-services",
+                "refresh_token": self.offline_token,
+            },
+            timeout=SSO_REQUEST_TIMEOUT,
+        )
+        if response.status_code != 200:
+            if (
+                response.status_code == 400
+                and response.json().get("error_description") == "Offline user session not found"
+            ):
+                raise AuthenticationError(
+                    "OFFLINE Token Expired! Please update your config with a new token from: "
+                    f"https://cloud.redhat.com/openshift/token\nError Code: {response.status_code}"
+                )
+
+            raise EndpointAccessError(err=response.status_code, endpoint=self.endpoint)
+
+        token = response.json()
+        return {"access_token": token["access_token"], "expires_at": request_time + token["expires_in"]}
+
+
+class CachedTokenOCMPythonClient(OCMPythonClient):
+    """
+    OCMPythonClient which gets its access token from OCMAccessTokenCache, instead of exchanging the offline token
+    with SSO for every session.
+
+    The client configuration is built with the cached access token, and tokens rejected by the API are refreshed
+    through the cache, so OCMPythonClient's own SSO token exchange is never used.
+
+    `api_host` is either an OCM environment name or an API URL (e.g. a local fake API server).
+    """
+
+    def __init__(self, token, endpoint, api_host="production", discard_unknown_keys=False, token_cache=None):
+        self.endpoint = endpoint
+        self.token = token
+        self.token_cache = token_cache or OCMAccessTokenCache(offline_token=token, endpoint=endpoint, api_host=api_host)
+        self.client_config = Configuration(
+            host=self.get_base_api_uri(api_host),
+            access_token=self.token_cache.get_access_token(),
+            discard_unknown_keys=discard_unknown_keys,
+        )
+        ApiClient.__init__(self, configuration=self.client_config)
+
+    def call_api(self, *args, **kwargs):
+        # Refreshed ahead of expiry; usually served from memory
+        self.client_config.access_token = self.token_cache.get_access_token()
+        try:
+            return ApiClient.call_api(self, *args, **kwargs)
+        except UnauthorizedException:
+            LOGGER.warning("Refreshing client token.")
+            self.client_config.access_token = self.token_cache.get_access_token(
+                rejected_token=self.client_config.access_token
+            )
+            return ApiClient.call_api(self, *args, **kwargs)
+
+    @staticmethod
+    def get_base_api_uri(api_host):
+        if api_host.startswith("http"):
+            return api_host
+
+        return OCMPythonClient.get_base_api_uri(api_host)
@@ -1,9 +1,7 @@
+import os
+
 import pytest as pytest
-from ocp_wrapper_data_collector.data_collector import (
-    get_data_collector_base_dir,
-    get_data_collector_dict,
-    write_to_file,
-)
+from pytest_testconfig import py_config
 from simple_logger.logger import get_logger
 
 
@@ -20,7 +18,9 @@ def exit_pytest_execution(
     """Exit pytest execution
 
     Exit pytest execution; invokes pytest_sessionfinish.
-    Optionally, log an error message to tests-collected-info/utilities/pytest_exit_errors/<filename>
+    Optionally, log an error message to tests-collected-info/utilities/pytest_exit_errors/<filename>; when the
+    session data collector is enabled, the message is stored under its current directory, through the session
+    content store.
 
     Args:
         message (str):  Message to display upon exit and to log in errors file
@@ -29,12 +29,30 @@ def exit_pytest_execution(
         junitxml_property (pytest plugin): record_testsuite_property
     """
     if filename:
-        write_to_file(
-            file_name=filename,
-            content=message,
-            base_directory=get_data_collector_base_dir(data_collector_dict=get_data_collector_dict()),
-            extra_dir_name="pytest_exit_errors",
-        )
+        data_collector_dict = py_config.get("data_collector")
+        if data_collector_dict:
+            from utilities.data_collector import get_content_store
+
+            collector_directory = data_collector_dict.get(
+                "collector_directory", data_collector_dict["data_collector_base_directory"]
+            )
+            get_content_store(data_collector_dict=data_collector_dict).write(
+                file_path=os.path.join(collector_directory, "pytest_exit_errors", filename),
+                content=message,
+            )
+        else:
+            from ocp_wrapper_data_collector.data_collector import (
+                get_data_collector_base_dir,
+                get_data_collector_dict,
+                write_to_file,
+            )
+
+            write_to_file(
+                file_name=filename,
+                content=message,
+                base_directory=get_data_collector_base_dir(data_collector_dict=get_data_collector_dict()),
+                extra_dir_name="pytest_exit_errors",
+            )
     if junitxml_property:
         junitxml_property(name="exit_code", value=return_code)
     pytest.exit(msg=message, returncode=return_code)
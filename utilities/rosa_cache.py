@@ -0,0 +1,112 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from simple_logger.logger import get_logger
+
+from utilities.cache_directory import ensure_private_cache_directory
+
+
+LOGGER = get_logger(name=__name__)
+ROSA_CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), f"rosa-cache-{os.getuid()}")
+ROSA_CACHE_TTL = 24 * 60 * 60
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def get_rosa_binary_hash(cache_directory=ROSA_CACHE_DIRECTORY):
+    """
+    The binary sha256 is stored per binary path, size and mtime, so the binary is hashed only when it changes.
+
+    Args:
+        cache_directory (str): cache directory path
+
+    Returns:
+        str: sha256 of the rosa binary in PATH, None if rosa is not installed
+    """
+    rosa_binary = shutil.which("rosa")
+    if not rosa_binary:
+        return None
+
+    rosa_binary = os.path.realpath(rosa_binary)
+    binary_stat = os.stat(rosa_binary)
+    stat_key = hashlib.sha256(f"{rosa_binary}:{binary_stat.st_size}:{binary_stat.st_mtime_ns}".encode()).hexdigest()
+    hash_file = os.path.join(cache_directory, f"rosa-binary-{stat_key}")
+    try:
+        with open(hash_file) as fd:
+            return fd.read()
+    except OSError:
+        pass
+
+    binary_hash = hashlib.sha256()
+    with open(rosa_binary, "rb") as fd:
+        for chunk in iter(lambda: fd.read(HASH_CHUNK_SIZE), b""):
+            binary_hash.update(chunk)
+
+    write_cache_file(cache_directory=cache_directory, cache_file=hash_file, content=binary_hash.hexdigest())
+    return binary_hash.hexdigest()
+
+
+def write_cache_file(cache_directory, cache_file, content):
+    # Written to a temporary file and renamed, readers never see a partial file
+    fd, tmp_file = tempfile.mkstemp(dir=cache_directory)
+    with os.fdopen(fd, "w") as tmp_fd:
+        tmp_fd.write(content)
+
+    os.replace(tmp_file, cache_file)
+
+
+def get_cached_rosa_result(name, func, key_parts=(), ttl=ROSA_CACHE_TTL, cache_directory=ROSA_CACHE_DIRECTORY):
+    """
+    Get a rosa result which is stable for a given rosa binary, from the cache or by calling `func`.
+
+    The cache is keyed by `name`, the rosa binary sha256 and `key_parts` (e.g. OCM environment). Parallel sessions
+    wait for the session which is calling `func`, and then use its result. The cache is not used if the cache
+    directory is not private to the current user.
+
+    Args:
+        name (str): result name, e.g. parse_help
+        func (Callable): returns the result when it is not cached; the result must be JSON serializable
+        key_parts (list): additional cache key parts, e.g. OCM environment
+        ttl (int): seconds a cached result is used for
+        cache_directory (str): cache directory path
+
+    Returns:
+        any: `func` result
+    """
+    if not ensure_private_cache_directory(directory=cache_directory):
+        return func()
+
+    rosa_binary_hash = get_rosa_binary_hash(cache_directory=cache_directory)
+    if not rosa_binary_hash:
+        return func()
+
+    cache_key = hashlib.sha256(json.dumps([name, rosa_binary_hash, *key_parts]).encode()).hexdigest()
+    cache_file = os.path.join(cache_directory, f"{name}-{cache_key}.json")
+    with open(f"{cache_file}.lock", "a") as lock_fd:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(cache_file) as fd:
+                    cached = json.load(fd)
+
+                if time.time() - cached["created"] < ttl:
+                    LOGGER.info(f"Using cached rosa {name} result from {cache_file}")
+                    return cached["result"]
+
+            except (OSError, ValueError, KeyError):
+                pass
+
+            result = func()
+            write_cache_file(
+                cache_directory=cache_directory,
+                cache_file=cache_file,
+                content=json.dumps({"created": time.time(), "result": result}),
+            )
+            return result
+
+        finally:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
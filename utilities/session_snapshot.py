@@ -0,0 +1,86 @@
+import fcntl
+import json
+import os
+import tempfile
+
+from simple_logger.logger import get_logger
+
+
+LOGGER = get_logger(name=__name__)
+# xdist workerinput key, set by the controller for each worker
+SESSION_SNAPSHOT_DIRECTORY_INPUT = "session_snapshot_directory"
+
+
+def get_xdist_worker_id(config):
+    """
+    Args:
+        config (pytest.Config): pytest config
+
+    Returns:
+        str: xdist worker id (e.g. gw0), None if not running as an xdist worker
+    """
+    workerinput = getattr(config, "workerinput", None)
+    return workerinput["workerid"] if workerinput else None
+
+
+def get_worker_file_path(config, file_path):
+    """
+    Get a per-worker file path, so xdist workers do not write to the same file.
+
+    Example:
+        file_path = "pytest-tests.log", worker gw1 -> "pytest-tests-gw1.log"
+
+    Args:
+        config (pytest.Config): pytest config
+        file_path (str): file path
+
+    Returns:
+        str: file path with the worker id suffix, `file_path` if not running as an xdist worker
+    """
+    worker_id = get_xdist_worker_id(config=config)
+    if not worker_id:
+        return file_path
+
+    root, extension = os.path.splitext(file_path)
+    return f"{root}-{worker_id}{extension}"
+
+
+def get_session_snapshot(config, name, func):
+    """
+    Get session data which is computed once per test run, also when tests are distributed by xdist.
+
+    Under xdist, the first worker which requests a snapshot computes it and stores it, JSON-serialized, in the run
+    snapshot directory created by the controller; other workers wait for it and load it.
+
+    Args:
+        config (pytest.Config): pytest config
+        name (str): snapshot name, unique in the run
+        func (Callable): computes the snapshot; the result must be JSON serializable
+
+    Returns:
+        any: `func` result
+    """
+    snapshot_directory = getattr(config, "workerinput", {}).get(SESSION_SNAPSHOT_DIRECTORY_INPUT)
+    if not snapshot_directory:
+        return func()
+
+    snapshot_file = os.path.join(snapshot_directory, f"{name}.json")
+    with open(f"{snapshot_file}.lock", "a") as lock_fd:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(snapshot_file):
+                LOGGER.info(f"Using session snapshot {name} from {snapshot_file}")
+                with open(snapshot_file) as fd:
+                    return json.load(fd)
+
+            snapshot = func()
+            # Written to a temporary file and renamed, readers never see a partial file
+            fd, tmp_file = tempfile.mkstemp(dir=snapshot_directory)
+            with os.fdopen(fd, "w") as tmp_fd:
+                json.dump(snapshot, tmp_fd)
+
+            os.replace(tmp_file, snapshot_file)
+            return snapshot
+
+        finally:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)